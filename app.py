@@ -1,15 +1,15 @@
 import sys
 import os
-import time
 import math
 import shutil 
-import json   
 import subprocess
 import difflib
 import html
 import zipfile
 import datetime
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -17,13 +17,19 @@ from PyQt6.QtWidgets import (
     QPushButton, QTextEdit, QFileDialog, QSplitter, QFrame,
     QProgressBar, QTreeWidget, QTreeWidgetItem, QDialog, QInputDialog,
     QPlainTextEdit, QSizePolicy, QToolButton, QSizeGrip, QFileIconProvider,
-    QLineEdit
+    QLineEdit, QCheckBox, QToolTip
 )
 from PyQt6.QtGui import (
     QPainter, QPen, QBrush, QColor, QFont, QPainterPath, QAction, QIcon,
-    QTextCharFormat, QTextCursor, QTextImageFormat
+    QTextCharFormat, QTextCursor, QTextImageFormat, QImage, QPixmap
 )
-from PyQt6.QtCore import Qt, QPointF, QRect, QTimer, pyqtSignal, QFileInfo, QSize, QThread, QUrl
+from PyQt6.QtCore import Qt, QPointF, QRect, QTimer, pyqtSignal, QFileInfo, QSize, QThread, QUrl, QObject, QEvent
+
+from gitflow_engine import (
+    BASE_DIR, load_settings, update_settings, format_size, scan_tree, SyncReport,
+    migrate_json_to_sqlite, ProjectEngine, ProjectIndex
+)
+from gitflow_git import GitImporter, GitExporter
 
 # ====================================================================
 # CẤU HÌNH PATH & STYLE
@@ -33,26 +39,11 @@ from PyQt6.QtCore import Qt, QPointF, QRect, QTimer, pyqtSignal, QFileInfo, QSiz
 # CẤU HÌNH PATH & STYLE
 # ====================================================================
 
-# Xác định đường dẫn gốc (đã sửa để chạy được cả file exe và code thường)
-if getattr(sys, 'frozen', False):
-    BASE_DIR = os.path.dirname(sys.executable)
-else:
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-# Đường dẫn file cấu hình để lưu lựa chọn của người dùng
-CONFIG_FILE = os.path.join(BASE_DIR, 'settings.json')
-
 # Mặc định chưa có, sẽ được gán khi khởi động app
 DATA_ROOT_DIR = None
 
-# Bảng màu Neon rực rỡ
-BRANCH_COLORS = {
-    'master':  {'node': '#00b8e6', 'lane': '#e0f7fa', 'line': '#00b8e6'}, # Cyan
-    'hotfix':  {'node': '#ff0055', 'lane': '#ffebee', 'line': '#ff0055'}, # Red
-    'release': {'node': '#ff9900', 'lane': '#fff3e0', 'line': '#ff9900'}, # Orange
-    'develop': {'node': '#aa00ff', 'lane': '#f3e5f5', 'line': '#aa00ff'}, # Purple
-    'feature': {'node': '#00cc66', 'lane': '#e8f5e9', 'line': '#00cc66'}  # Green
-}
+# Kiểu lưu trữ dữ liệu dự án: 'json' (data.json + journal) hoặc 'sqlite' (data.sqlite)
+STORAGE_BACKEND = 'json'
 
 MODERN_STYLESHEET = """
     QMainWindow { background-color: #f8fafc; }
@@ -99,18 +90,12 @@ def initialize_data_storage():
     Hàm này kiểm tra xem đã có đường dẫn lưu dữ liệu chưa.
     Nếu chưa, hiện hộp thoại yêu cầu chọn folder và lưu lại vào settings.json.
     """
-    global DATA_ROOT_DIR
-    
-    saved_path = None
+    global DATA_ROOT_DIR, STORAGE_BACKEND
     
     # 1. Thử đọc từ file settings.json nếu tồn tại
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                saved_path = config.get('data_root_dir')
-        except Exception:
-            pass # Lỗi đọc file thì bỏ qua, coi như chưa có
+    config = load_settings()
+    saved_path = config.get('data_root_dir')
+    STORAGE_BACKEND = config.get('storage_backend', STORAGE_BACKEND)
 
     # 2. Kiểm tra đường dẫn đã lưu có hợp lệ không
     if saved_path and os.path.isdir(saved_path):
@@ -132,8 +117,7 @@ def initialize_data_storage():
         DATA_ROOT_DIR = chosen_dir
         # Lưu lại vào file settings để lần sau không hỏi nữa
         try:
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump({'data_root_dir': chosen_dir}, f)
+            update_settings(data_root_dir=chosen_dir)
         except Exception as e:
             QMessageBox.warning(None, "Lỗi", f"Không thể lưu cấu hình: {e}")
     else:
@@ -146,40 +130,187 @@ def initialize_data_storage():
 
 
 class FileWorker(QThread):
+    """
+    Chạy thao tác file nặng trên thread riêng.
+    - Có src: nạp folder vào kho object, kết quả (manifest) nằm ở self.result.
+      incremental=True: so với manifest hiện tại của commit, chỉ nạp file mới/thay đổi.
+    - Không có src: dựng lại thư mục làm việc của commit từ manifest.
+    """
     progress_signal = pyqtSignal(int, int, str)
     finished_signal = pyqtSignal()
     error_signal = pyqtSignal(str)
 
-    def __init__(self, src, dst):
+    def __init__(self, engine, commit_id, src=None, incremental=True, verify_hash=False):
         super().__init__()
+        self.engine = engine
+        self.commit_id = commit_id
         self.src = src
-        self.dst = dst
+        self.incremental = incremental
+        self.verify_hash = verify_hash
+        self.result = None
+        self.report = SyncReport()
 
     def run(self):
         try:
-            if os.path.exists(self.dst): shutil.rmtree(self.dst)
-            os.makedirs(self.dst)
-            if not os.path.exists(self.src): 
-                self.finished_signal.emit()
-                return
-
-            total_files = sum([len(files) for r, d, files in os.walk(self.src)])
-            copied_files = 0
-            
-            for root, dirs, files in os.walk(self.src):
-                rel_path = os.path.relpath(root, self.src)
-                target_dir = os.path.join(self.dst, rel_path)
-                if not os.path.exists(target_dir): os.makedirs(target_dir)
-                
-                for file in files:
-                    shutil.copy2(os.path.join(root, file), os.path.join(target_dir, file))
-                    copied_files += 1
-                    self.progress_signal.emit(copied_files, total_files, file)
+            if self.src is not None:
+                previous = self.engine.get_manifest(self.commit_id) if self.incremental else None
+                self.result = self.engine.build_snapshot(self.src, progress=self.progress_signal.emit,
+                                                         previous=previous, verify_hash=self.verify_hash,
+                                                         report=self.report)
+                # Đánh chỉ mục nội dung ngay trên thread này, set_snapshot sau đó không phải đọc lại file
+                self.progress_signal.emit(0, 0, "Đánh chỉ mục nội dung...")
+                self.engine.index_snapshot(self.result)
+            else:
+                self.result = self.engine.materialize_workspace(self.commit_id, progress=self.progress_signal.emit,
+                                                                report=self.report)
+            self.finished_signal.emit()
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+class GitImportWorker(QThread):
+    """Nhập lịch sử repo git vào một dự án mới trên thread riêng; self.result = số commit đã nhập."""
+    progress_signal = pyqtSignal(int, int, str)
+    finished_signal = pyqtSignal()
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, project_name, repo, snapshots=()):
+        super().__init__()
+        self.project_name = project_name
+        self.repo = repo
+        self.snapshots = snapshots
+        self.result = None
 
+    def run(self):
+        try:
+            engine = ProjectEngine(self.project_name, DATA_ROOT_DIR, STORAGE_BACKEND)
+            try: self.result = GitImporter(engine, self.repo, self.progress_signal.emit).run(self.snapshots)
+            finally: engine.close()
             self.finished_signal.emit()
         except Exception as e:
+            # Dự án được tạo riêng cho lần nhập này -> nhập lỗi thì bỏ luôn
+            shutil.rmtree(os.path.join(DATA_ROOT_DIR, self.project_name), ignore_errors=True)
             self.error_signal.emit(str(e))
 
+class GitExportWorker(QThread):
+    """Xuất dự án sang repo git (qua git fast-import) trên thread riêng; self.result = số commit đã xuất."""
+    progress_signal = pyqtSignal(int, int, str)
+    finished_signal = pyqtSignal()
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, engine, repo):
+        super().__init__()
+        self.engine = engine
+        self.repo = repo
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = GitExporter(self.engine, self.progress_signal.emit).export_to_repo(self.repo)
+            self.finished_signal.emit()
+        except Exception as e: self.error_signal.emit(str(e))
+
+class WorkspaceSyncWorker(QThread):
+    """Ghi nhận thay đổi trong các workspace đang có trên đĩa (sửa bằng VS Code, Explorer) trên thread riêng."""
+    finished_signal = pyqtSignal()
+
+    def __init__(self, engines):
+        super().__init__()
+        self.engines = engines
+        self.result = 0  # Số snapshot vừa đổi
+
+    def run(self):
+        for engine in self.engines:
+            try: self.result += len(engine.sync_all_workspaces())
+            except OSError: pass  # Workspace đang bị xóa / khóa -> lần đồng bộ sau
+        self.finished_signal.emit()
+
+class NoteTextWorker(QThread):
+    """Đọc chữ đầy đủ của các ghi chú dài (cho ô lọc) trên thread riêng; self.result = {id commit: chữ}."""
+    finished_signal = pyqtSignal()
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self.result = {}
+
+    def run(self):
+        try: self.result = self.engine.long_note_texts()
+        except OSError: pass  # Ghi chú đang bị xóa -> lọc theo đoạn xem trước
+        self.finished_signal.emit()
+
+class NoteWriter(QObject):
+    """
+    Ghi ghi chú xuống đĩa kiểu write-behind trên một thread nền duy nhất (giữ đúng thứ tự ghi).
+    Nhiều lần sửa cùng một commit trong lúc chờ ghi được gộp thành một lần ghi bản mới nhất.
+    """
+    flushed = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, engine, commit_id, text):
+        with self._lock:
+            drain_scheduled = bool(self._pending)
+            self._pending[(engine, commit_id)] = text
+        if not drain_scheduled: self._executor.submit(self._drain)
+
+    def _drain(self):
+        with self._lock:
+            batch, self._pending = self._pending, OrderedDict()
+        written = 0
+        for (engine, commit_id), text in batch.items():
+            try:
+                engine.persist_note(commit_id, text)
+                written += 1
+            except Exception:
+                pass  # Dự án đã bị xóa trong lúc chờ ghi
+        if written: self.flushed.emit(written)
+
+    def flush(self):
+        # Chờ các lần ghi đã xếp hàng chạy xong (executor chỉ có một thread nên chạy theo thứ tự)
+        self._executor.submit(lambda: None).result()
+
+    def wait(self):
+        # Chờ ghi hết (gọi khi thoát app)
+        self._executor.shutdown(wait=True)
+
+class NoteEdit(QTextEdit):
+    """
+    Ô soạn ghi chú: ảnh dạng 'asset:<tên>' được hiển thị bằng thumbnail trong kho asset của dự án,
+    double-click vào ảnh mới mở ảnh gốc.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.engine = None
+
+    def loadResource(self, rtype, url):
+        if url.scheme() == 'asset' and self.engine:
+            path = self.engine.asset_thumbnail_path(url.path())
+            return QImage(path) if path else QImage()
+        return super().loadResource(rtype, url)
+
+    def asset_at(self, pos):
+        cursor = self.cursorForPosition(pos)
+        for _ in range(2):
+            fmt = cursor.charFormat()
+            if fmt.isImageFormat():
+                url = QUrl(fmt.toImageFormat().name())
+                if url.scheme() == 'asset': return url.path()
+            cursor.movePosition(QTextCursor.MoveOperation.NextCharacter)
+        return None
+
+    def mouseDoubleClickEvent(self, event):
+        name = self.asset_at(event.pos()) if self.engine else None
+        path = self.engine.asset_path(name) if name else None
+        if path and os.path.exists(path):
+            if sys.platform == 'win32': os.startfile(path)
+            else: subprocess.Popen(['xdg-open', path])
+            return
+        super().mouseDoubleClickEvent(event)
+
 class DiffDialog(QDialog):
     def __init__(self, old_content, new_content, file_name, parent=None):
         super().__init__(parent)
@@ -304,13 +435,15 @@ class DiffDialog(QDialog):
         h_sb_new.valueChanged.connect(h_sb_old.setValue)
 
 class FileEditorDialog(QDialog):
-    def __init__(self, file_path, parent=None):
+    def __init__(self, engine, commit_id, rel_path, parent=None, line=None):
         super().__init__(parent)
-        self.file_path = file_path
-        self.setWindowTitle(f"Sửa: {os.path.basename(file_path)}")
+        self.engine = engine
+        self.commit_id = commit_id
+        self.rel_path = rel_path
+        self.setWindowTitle(f"Sửa: {os.path.basename(rel_path)}")
         self.resize(700, 500)
         layout = QVBoxLayout(self)
-        layout.addWidget(QLabel(file_path))
+        layout.addWidget(QLabel(f"{commit_id}: {rel_path}"))
         self.editor = QPlainTextEdit()
         self.editor.setFont(QFont("Consolas", 10))
         self.editor.setStyleSheet("background-color: #1e293b; color: #f8fafc; border-radius: 4px;")
@@ -322,18 +455,67 @@ class FileEditorDialog(QDialog):
         btn_layout.addWidget(btn_save)
         layout.addLayout(btn_layout)
         self.load_file()
+        if line:
+            cursor = QTextCursor(self.editor.document().findBlockByNumber(line - 1))
+            self.editor.setTextCursor(cursor)
+            self.editor.centerCursor()
     def load_file(self):
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.editor.setPlainText(f.read())
+            data = self.engine.read_file(self.commit_id, self.rel_path)
+            self.editor.setPlainText(data.decode('utf-8'))
         except Exception as e: QMessageBox.critical(self, "Lỗi", str(e))
     def save_file(self):
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                f.write(self.editor.toPlainText())
+            self.engine.write_file(self.commit_id, self.rel_path, self.editor.toPlainText().encode('utf-8'))
             self.accept()
         except Exception as e: QMessageBox.critical(self, "Lỗi", str(e))
 
+class ContentSearchDialog(QDialog):
+    """Tìm chuỗi / định danh trong file của mọi commit; commit có kết quả được tô sáng trên canvas."""
+    def __init__(self, wrapper):
+        super().__init__(wrapper)
+        self.wrapper = wrapper
+        self.engine = wrapper.ensure_loaded()
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.setWindowTitle(f"Tìm trong file: {wrapper.project_name}")
+        self.resize(760, 460)
+        layout = QVBoxLayout(self)
+        self.input = QLineEdit()
+        self.input.setPlaceholderText("Chuỗi hoặc tên định danh, Enter để tìm...")
+        self.input.returnPressed.connect(self.run_search)
+        layout.addWidget(self.input)
+        self.lbl_status = QLabel("")
+        self.lbl_status.setStyleSheet("color: #64748b; font-size: 11px;")
+        layout.addWidget(self.lbl_status)
+        self.results = QTreeWidget()
+        self.results.setHeaderLabels(["Commit", "File", "Dòng", "Nội dung"])
+        self.results.setRootIsDecorated(False)
+        self.results.itemDoubleClicked.connect(self.open_result)
+        layout.addWidget(self.results)
+
+    def run_search(self):
+        query = self.input.text().strip()
+        self.results.clear()
+        if not query: return
+        self.engine = self.wrapper.ensure_loaded()  # Dự án có thể đã bị giải phóng khi thu gọn
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try: hits = self.engine.search_content(query)
+        finally: QApplication.restoreOverrideCursor()
+        for commit_id, rel, line, text in hits:
+            item = QTreeWidgetItem([commit_id, rel, str(line), text[:200]])
+            item.setData(0, Qt.ItemDataRole.UserRole, (commit_id, rel, line))
+            self.results.addTopLevelItem(item)
+        for col in range(3): self.results.resizeColumnToContents(col)
+        commit_ids = {hit[0] for hit in hits}
+        self.lbl_status.setText(f"{len(hits)} dòng trong {len(commit_ids)} commit")
+        self.wrapper.canvas.show_matches(commit_ids)
+
+    def open_result(self, item, col):
+        commit_id, rel, line = item.data(0, Qt.ItemDataRole.UserRole)
+        if commit_id not in self.engine.all_commits: return
+        self.wrapper.canvas.select_node(commit_id)
+        FileEditorDialog(self.engine, commit_id, rel, self, line=line).exec()
+
 class ModernProgressDialog(QDialog):
     def __init__(self, title, parent=None):
         super().__init__(parent)
@@ -362,197 +544,49 @@ class ModernProgressDialog(QDialog):
         percent = int(val / total * 100) if total > 0 else 0
         self.pbar.setValue(percent)
         self.lbl_file.setText(f"File: {filename}")
-        self.lbl_status.setText(f"Đang xử lý... {percent}%")
+        self.lbl_status.setText(f"Đang xử lý... {val}/{total} ({percent}%)")
 
 # ====================================================================
-# ENGINE CORE
+# CANVAS
 # ====================================================================
 
-class Commit:
-    def __init__(self, id, message, branch_name, is_tag=None, note="", has_folder=False, source_id=None):
-        self.id = id
-        self.message = message
-        self.branch_name = branch_name
-        self.parents = []     
-        self.children = []
-        self.x = 0; self.y = 0 
-        self.is_tag = is_tag
-        self.note = note
-        self.has_folder = has_folder
-        self.source_id = source_id if source_id else id 
-
-    def add_parent(self, commit):
-        if commit not in self.parents: self.parents.append(commit)
-    def add_child(self, commit):
-        if commit not in self.children: self.children.append(commit)
-    def to_dict(self):
-        return {
-            "id": self.id, "message": self.message, "branch_name": self.branch_name,
-            "is_tag": self.is_tag, "parent_ids": [p.id for p in self.parents],
-            "x": self.x, "y": self.y, "note": self.note, 
-            "has_folder": self.has_folder,
-            "source_id": self.source_id 
-        }
-
-class Branch:
-    def __init__(self, name, color_key, head):
-        self.name = name
-        self.color_key = color_key
-        colors = BRANCH_COLORS.get(color_key, BRANCH_COLORS['feature'])
-        self.color = colors['node']
-        self.lane_color = colors['lane']
-        self.line = colors['line']
-        self.head = head
-        self.commits = [head] 
-
-    def commit(self, new_commit):
-        new_commit.add_parent(self.head)
-        self.head.add_child(new_commit)
-        self.head = new_commit
-        self.commits.append(new_commit)
-
-class ProjectEngine:
-    def __init__(self, project_name="Project_Default"):
-        self.project_name = project_name
-        self.branches = OrderedDict() 
-        self.all_commits = {}
-        self.commit_counter = 0
-        self.branch_line_offset = {}
-        self.commit_x_map = {} 
-        self.x_step = 100; self.y_step = 70; self.base_start_x = 60
-        self.current_max_x = self.base_start_x; self.current_max_y = 300 
-        self.current_branch_name = 'master'
-        self.canvas = None 
-        self.project_dir = os.path.join(DATA_ROOT_DIR, project_name)
-        self.json_path = os.path.join(self.project_dir, 'data.json')
-        self.files_dir = os.path.join(self.project_dir, 'Commit_Files')
-        self._setup_directories()
-        if not self.load_data(): self._initialize_git_history_clean() 
-
-    def _setup_directories(self):
-        if not os.path.exists(self.project_dir): os.makedirs(self.project_dir)
-        if not os.path.exists(self.files_dir): os.makedirs(self.files_dir)
-
-    def _get_new_commit_id(self):
-        self.commit_counter += 1
-        return f"{self.project_name[0]}-{self.commit_counter}"
-
-    def get_commit_folder_path(self, commit_id):
-        return os.path.join(self.files_dir, commit_id)
-
-    def resolve_storage_path(self, commit_id):
-        if commit_id not in self.all_commits: return None
-        commit = self.all_commits[commit_id]
-        if commit.source_id and commit.source_id != commit.id:
-            return self.get_commit_folder_path(commit.source_id)
-        return self.get_commit_folder_path(commit.id)
-
-    def link_commit_files(self, src_commit_id, dst_commit_id):
-        if src_commit_id not in self.all_commits or dst_commit_id not in self.all_commits: return
-        src = self.all_commits[src_commit_id]
-        dst = self.all_commits[dst_commit_id]
-        dst.source_id = src.source_id
-        if src.has_folder:
-            dst.has_folder = True
-
-    def save_data(self):
-        data = {
-            "counter": self.commit_counter, "current_branch": self.current_branch_name,
-            "commits": [c.to_dict() for c in self.all_commits.values()],
-            "branches": list(self.branches.keys())
-        }
-        with open(self.json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
-
-    def load_data(self):
-        if not os.path.exists(self.json_path): return False
-        try:
-            with open(self.json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            self.commit_counter = data["counter"]
-            self.current_branch_name = data["current_branch"]
-            for c_data in data["commits"]:
-                c = Commit(c_data["id"], c_data["message"], c_data["branch_name"], 
-                           c_data["is_tag"], c_data.get("note", ""), 
-                           c_data.get("has_folder", False),
-                           c_data.get("source_id", None)) 
-                c.x, c.y = c_data["x"], c_data["y"]
-                self.all_commits[c.id] = c
-                self.commit_x_map[c.id] = c.x
-            for c_data in data["commits"]:
-                child = self.all_commits[c_data["id"]]
-                for pid in c_data["parent_ids"]:
-                    if pid in self.all_commits:
-                        parent = self.all_commits[pid]
-                        child.add_parent(parent)
-                        parent.add_child(child)
-            self.branches = OrderedDict()
-            commits_by_branch = {}
-            for c in self.all_commits.values():
-                commits_by_branch.setdefault(c.branch_name, []).append(c)
-            for b_name in data.get("branches", []):
-                if b_name in commits_by_branch:
-                    branch_commits = commits_by_branch[b_name]
-                    head = max(branch_commits, key=lambda x: x.x)
-                    color_key = b_name if b_name in BRANCH_COLORS else 'feature'
-                    br = Branch(b_name, color_key, head)
-                    br.commits = branch_commits
-                    self.branches[b_name] = br
-            self.calculate_commit_positions()
-            return True
-        except Exception: return False
-
-    def _initialize_git_history_clean(self):
-        c1 = Commit(f"{self.project_name[0]}-1", "Init", "master", is_tag=" ")
-        c1.source_id = c1.id 
-        self.all_commits[c1.id] = c1
-        self.commit_counter = 1
-        self.branches["master"] = Branch("master", 'master', c1)
-        self.current_branch_name = 'master'
-        self.commit_x_map[c1.id] = self.base_start_x
-        self.current_max_x = self.base_start_x
-        self.calculate_commit_positions()
-        self.save_data()
-
-    def _recalculate_branch_offsets(self):
-        current_y = 60
-        order = ['master', 'hotfix', 'release', 'develop']
-        def sort_key(name): return order.index(name) if name in order else 99
-        for name in sorted(self.branches.keys(), key=sort_key):
-            self.branch_line_offset[name] = current_y
-            current_y += self.y_step
-        self.current_max_y = current_y + 50
-
-    def calculate_commit_positions(self):
-        self._recalculate_branch_offsets()
-        max_x_found = self.base_start_x
-        for commit in self.all_commits.values():
-            commit.y = self.branch_line_offset.get(commit.branch_name, 0)
-            commit.x = self.commit_x_map.get(commit.id, 0)
-            if commit.x > max_x_found: max_x_found = commit.x
-        self.current_max_x = max_x_found
-        if self.canvas: self.canvas.update_size(self.current_max_x + 400, self.current_max_y)
-
-    def _create_new_branch(self, name, color_key, new_commit, start_commit):
-        new_branch = Branch(name, color_key, new_commit)
-        self.branches[name] = new_branch
-        self.all_commits[new_commit.id] = new_commit
-        new_commit.add_parent(start_commit)
-        start_commit.add_child(new_commit)
-        self.current_max_x += self.x_step
-        self.commit_x_map[new_commit.id] = self.current_max_x
-        self.current_branch_name = name
-        self.calculate_commit_positions()
-        self.save_data()
-
-    def update_note(self, commit_id, text):
-        if commit_id in self.all_commits:
-            self.all_commits[commit_id].note = text
-            self.save_data()
+class AnimationClock(QObject):
+    """
+    Nhịp chung cho hiệu ứng nhấp nháy của mọi canvas. Canvas chỉ đăng ký khi có node đang chọn và
+    đang hiển thị; không còn canvas nào đăng ký thì timer dừng hẳn.
+    """
+    INTERVAL_MS = 30
+    STEP = 0.15
+    _instance = None
 
-# ====================================================================
-# CANVAS
-# ====================================================================
+    @classmethod
+    def instance(cls):
+        # Con của QApplication: sống tới khi mọi cửa sổ đã đóng (canvas còn gọi unsubscribe lúc ẩn)
+        if cls._instance is None: cls._instance = cls(QApplication.instance())
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.frame = 0
+        self._canvases = set()
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.INTERVAL_MS)
+        self._timer.timeout.connect(self._tick)
+
+    def subscribe(self, canvas):
+        self._canvases.add(canvas)
+        if not self._timer.isActive(): self._timer.start()
+
+    def unsubscribe(self, canvas):
+        self._canvases.discard(canvas)
+        if not self._canvases: self._timer.stop()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def _tick(self):
+        self.frame += self.STEP
+        for canvas in list(self._canvases): canvas.animate_nodes()
 
 class GitFlowCanvas(QWidget):
     node_selected = pyqtSignal(object, str) 
@@ -561,8 +595,7 @@ class GitFlowCanvas(QWidget):
         super().__init__()
         self.engine = engine
         self.engine.canvas = self 
-        self.selected_node_id = None
-        self.node_positions = {} 
+        self._selected_node_id = None
         
         self.highlighted_links = set()
         self.highlighted_nodes = set()
@@ -572,46 +605,155 @@ class GitFlowCanvas(QWidget):
         self.setStyleSheet("background-color: white;") 
         
         self.node_radius = 8 
-        self.anim_frame = 0
         self.filter_text = ""
-        
-        self.anim_timer = QTimer(self)
-        self.anim_timer.timeout.connect(self.animate_nodes)
-        self.anim_timer.start(30)
+        self.filter_matches = None
+        self.clock = AnimationClock.instance()
+        self._tiles = OrderedDict()  # (cột, hàng) -> QPixmap lớp tĩnh, LRU
+        self._tiles_key = None
+        self.lane_font = QFont("Segoe UI", 9, QFont.Weight.Bold)
+        self.tag_font = QFont("Segoe UI", 8, QFont.Weight.Bold)
 
         self.update_size(engine.current_max_x + 400, engine.current_max_y)
 
+    @property
+    def selected_node_id(self):
+        return self._selected_node_id
+
+    @selected_node_id.setter
+    def selected_node_id(self, commit_id):
+        self._selected_node_id = commit_id
+        self.sync_animation()
+
+    def sync_animation(self):
+        # Chỉ nhận nhịp khi có node đang chọn và canvas đang hiện (dự án thu gọn / cửa sổ thu nhỏ thì thôi)
+        if self._selected_node_id and self.isVisible(): self.clock.subscribe(self)
+        else: self.clock.unsubscribe(self)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.sync_animation()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.clock.unsubscribe(self)
+
     def update_size(self, w, h):
-        self.setMinimumSize(int(w), int(h))
-        self.resize(int(w), int(h))
+        size = QSize(int(w), int(h))
+        if size == self.minimumSize() and size == self.size(): return
+        self.setMinimumSize(size)
+        self.resize(size)
+
+    def glow_rect(self):
+        # Vùng bao quanh vòng sáng lớn nhất của node đang chọn (+ viền khử răng cưa)
+        commit = self.engine.all_commits.get(self.selected_node_id)
+        if commit is None: return QRect()
+        r = self.node_radius + 11
+        return QRect(int(commit.x) - r, int(commit.y) - r, 2 * r + 1, 2 * r + 1)
 
     def animate_nodes(self):
-        if self.selected_node_id:
-            self.anim_frame += 0.15 
-            self.update()
+        # Chỉ vẽ lại vùng vòng sáng, và chỉ khi vùng đó đang nằm trong khung nhìn
+        rect = self.glow_rect()
+        if rect.isEmpty(): self.clock.unsubscribe(self)
+        elif self.visibleRegion().intersects(rect): self.update(rect)
 
     def set_filter(self, text):
         self.filter_text = text.lower()
         self.update()
 
+    def show_matches(self, commit_ids):
+        # Tô sáng kết quả tìm nội dung (dùng chung kiểu tô sáng với lineage, click chỗ trống để bỏ)
+        self.selected_node_id = None
+        self.highlighted_nodes, self.highlighted_links = frozenset(commit_ids), frozenset()
+        self.update()
+
+    def select_node(self, commit_id):
+        self.selected_node_id = commit_id
+        self.node_selected.emit(self.engine, commit_id)
+        self.update()
+
+    # Nới vùng tra cứu: glow của node và nhãn tag vẽ lấn ra ngoài tọa độ node
+    CULL_MARGIN = 120
+    HIT_RADIUS = 20
+    TILE_SIZE = 1024
+    TILE_CACHE_SIZE = 16  # Số tile giữ lại ở 1x (4 MB/tile): đủ phủ khung nhìn và một đoạn cuộn hai bên
+
     def paintEvent(self, event):
+        """
+        Hai lớp: lớp tĩnh (lane, cạnh và node không tô sáng) vẽ sẵn thành tile QPixmap, chỉ vẽ lại khi
+        graph / bộ lọc / lựa chọn đổi; lớp trên (cạnh + node tô sáng, vòng sáng nhấp nháy) vẽ mỗi lần.
+        Nhịp nhấp nháy và cuộn chủ yếu chỉ chép tile.
+        """
         painter = QPainter(self)
-        painter.setClipRect(event.rect())
-        painter.fillRect(event.rect(), QColor("white"))
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        rect = event.rect()
+        painter.setClipRect(rect)
         
-        self.node_positions.clear()
+        # Tập commit khớp bộ lọc: engine chỉ tính lại khi câu tìm hoặc dữ liệu đổi
+        self.filter_matches = self.engine.search(self.filter_text) if self.filter_text else None
+        # Tập khớp đi kèm khóa: sửa note làm đổi commit khớp mà không đổi từ khóa lọc
+        key = (self.engine.render_version, self.filter_text, self.filter_matches, self.highlighted_nodes,
+               self.highlighted_links, self.selected_node_id, self.width(), self.devicePixelRatioF())
+        if key != self._tiles_key:
+            self._tiles.clear()
+            self._tiles_key = key
+        ts = self.TILE_SIZE
+        cols, rows = range(rect.left() // ts, rect.right() // ts + 1), range(rect.top() // ts, rect.bottom() // ts + 1)
+        # Màn hình HiDPI: tile tốn gấp ratio² bộ nhớ -> giữ ít tile hơn, nhưng luôn đủ cho vùng đang vẽ
+        self._tile_limit = max(int(self.TILE_CACHE_SIZE / self.devicePixelRatioF() ** 2), len(cols) * len(rows))
+        for ty in rows:
+            for tx in cols:
+                painter.drawPixmap(tx * ts, ty * ts, self._tile(tx, ty))
         
-        self.draw_lanes(painter)
-        self.draw_connections(painter)
-        self.draw_branch_extensions(painter)
-        self.draw_nodes_and_labels(painter)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        _, edges, nodes = self._visible(rect)
+        self.draw_connections(painter, [e for e in edges if (e[0].id, e[1].id) in self.highlighted_links])
+        self.draw_nodes_and_labels(painter, [c for c in nodes if self._in_overlay(c)])
         
         painter.end()
 
-    def draw_lanes(self, painter):
+    def _visible(self, rect):
+        # Chỉ lấy lane / cạnh / node giao với vùng cần vẽ (chỉ mục không gian của engine), thứ tự vẽ cố định
+        m = self.CULL_MARGIN
+        lanes, edges, nodes = self.engine.visible(rect.left() - m, rect.top() - m, rect.right() + m, rect.bottom() + m)
+        lanes.sort(key=lambda name: self.engine.branch_line_offset[name])
+        nodes.sort(key=lambda c: (c.x, c.y))
+        return lanes, edges, nodes
+
+    def _in_overlay(self, commit):
+        return commit.id in self.highlighted_nodes or commit.id == self.selected_node_id
+
+    def _tile(self, tx, ty):
+        tile = self._tiles.get((tx, ty))
+        if tile is not None:
+            self._tiles.move_to_end((tx, ty))
+            return tile
+        ts = self.TILE_SIZE
+        ratio = self.devicePixelRatioF()
+        tile = QPixmap(int(ts * ratio), int(ts * ratio))
+        tile.setDevicePixelRatio(ratio)
+        tile.fill(QColor("white"))
+        painter = QPainter(tile)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        painter.translate(-tx * ts, -ty * ts)
+        lanes, edges, nodes = self._visible(QRect(tx * ts, ty * ts, ts, ts))
+        self.draw_lanes(painter, lanes)
+        self.draw_connections(painter, [e for e in edges if (e[0].id, e[1].id) not in self.highlighted_links])
+        self.draw_branch_extensions(painter, lanes)
+        self.draw_nodes_and_labels(painter, [c for c in nodes if not self._in_overlay(c)])
+        painter.end()
+        self._tiles[(tx, ty)] = tile
+        while len(self._tiles) > self._tile_limit: self._tiles.popitem(last=False)
+        return tile
+
+    def node_at(self, pos):
+        r = self.HIT_RADIUS
+        for commit in self.engine.visible(pos.x() - r, pos.y() - r, pos.x() + r, pos.y() + r)[2]:
+            if (pos - QPointF(commit.x, commit.y)).manhattanLength() < r: return commit.id
+        return None
+
+    def draw_lanes(self, painter, lanes):
         w = max(self.width(), self.engine.current_max_x + 400)
-        for branch in self.engine.branches.values():
+        for name in lanes:
+            branch = self.engine.branches[name]
             y = self.engine.branch_line_offset.get(branch.name)
             if not y: continue
             
@@ -621,56 +763,56 @@ class GitFlowCanvas(QWidget):
             painter.drawRect(lane_rect)
             
             painter.setPen(QColor(branch.color))
-            painter.setFont(QFont("Segoe UI", 9, QFont.Weight.Bold))
+            painter.setFont(self.lane_font)
             painter.drawText(10, int(y) - 20, branch.name.upper())
 
-    def draw_connections(self, painter):
+    def draw_connections(self, painter, edges):
         draw_list = []
         GAP_THRESHOLD = self.engine.x_step * 1.2 
 
-        for commit in self.engine.all_commits.values():
-            for parent in commit.parents:
-                p_branch = self.engine.branches.get(parent.branch_name)
-                if not p_branch: continue
-
-                is_same_branch = (parent.branch_name == commit.branch_name)
-                distance = abs(commit.x - parent.x)
-                
-                base_color = QColor(p_branch.line)
-                is_highlighted = (parent.id, commit.id) in self.highlighted_links
-                
-                if is_highlighted:
-                    base_color = base_color.lighter(120)
-                    width = 4.5 
-                    base_color.setAlpha(220) 
-                    z_order = 10
-                    line_type = 'solid'
-                else:
-                    width = 3.0 
-                    base_color.setAlpha(255)
-                    if self.filter_text: base_color.setAlpha(40)
-                    z_order = 1
-                    line_type = 'solid'
-
-                if is_same_branch and distance > GAP_THRESHOLD:
-                    gap_color = QColor(base_color)
-                    gap_color.setAlpha(150)
-                    draw_list.append({
-                        'p': parent, 'c': commit, 
-                        'color': gap_color, 'width': 2.0, 
-                        'type': 'gap',
-                        'z': 0
-                    })
-                    continue 
+        for parent, commit in edges:
+            p_branch = self.engine.branches.get(parent.branch_name)
+            if not p_branch: continue
 
+            is_same_branch = (parent.branch_name == commit.branch_name)
+            distance = abs(commit.x - parent.x)
+            
+            base_color = QColor(p_branch.line)
+            is_highlighted = (parent.id, commit.id) in self.highlighted_links
+            
+            if is_highlighted:
+                base_color = base_color.lighter(120)
+                width = 4.5 
+                base_color.setAlpha(220) 
+                z_order = 10
+                line_type = 'solid'
+            else:
+                width = 3.0 
+                base_color.setAlpha(255)
+                if self.filter_text: base_color.setAlpha(40)
+                z_order = 1
+                line_type = 'solid'
+
+            if is_same_branch and distance > GAP_THRESHOLD:
+                gap_color = QColor(base_color)
+                gap_color.setAlpha(150)
                 draw_list.append({
                     'p': parent, 'c': commit, 
-                    'color': base_color, 'width': width, 
-                    'type': line_type,
-                    'z': z_order
+                    'color': gap_color, 'width': 2.0, 
+                    'type': 'gap',
+                    'z': 0
                 })
+                continue 
+
+            draw_list.append({
+                'p': parent, 'c': commit, 
+                'color': base_color, 'width': width, 
+                'type': line_type,
+                'z': z_order
+            })
 
-        draw_list.sort(key=lambda x: x['z'])
+        # Thứ tự vẽ cố định (không phụ thuộc thứ tự trả về của chỉ mục): lớp z, rồi theo commit con
+        draw_list.sort(key=lambda x: (x['z'], x['c'].x, x['c'].y, x['c'].parents.index(x['p'])))
 
         for item in draw_list:
             parent, commit = item['p'], item['c']
@@ -697,13 +839,14 @@ class GitFlowCanvas(QWidget):
                 painter.setBrush(Qt.BrushStyle.NoBrush)
                 painter.drawPath(path)
 
-    def draw_branch_extensions(self, painter):
+    def draw_branch_extensions(self, painter, lanes):
         w = max(self.width(), self.engine.current_max_x + 400)
         static_alpha = 100 
 
         TRUNK_PREFIXES = ['master', 'develop', 'release', 'hotfix']
 
-        for b_name, branch in self.engine.branches.items():
+        for b_name in lanes:
+            branch = self.engine.branches[b_name]
             head = branch.head
             y = self.engine.branch_line_offset.get(b_name)
             if not y: continue
@@ -730,16 +873,12 @@ class GitFlowCanvas(QWidget):
                 painter.setPen(pen)
                 painter.drawLine(QPointF(head.x + self.node_radius, y), QPointF(w, y))
 
-    def draw_nodes_and_labels(self, painter):
-        for commit in self.engine.all_commits.values():
+    def draw_nodes_and_labels(self, painter, nodes):
+        for commit in nodes:
             branch = self.engine.branches.get(commit.branch_name)
             if not branch: continue
-            self.node_positions[commit.id] = QPointF(commit.x, commit.y)
             
-            is_match = True
-            if self.filter_text:
-                search_data = f"{commit.id} {commit.message} {commit.is_tag}".lower()
-                is_match = self.filter_text in search_data
+            is_match = self.filter_matches is None or commit.id in self.filter_matches
 
             is_highlighted = commit.id in self.highlighted_nodes
             is_selected = (commit.id == self.selected_node_id)
@@ -753,7 +892,7 @@ class GitFlowCanvas(QWidget):
                 painter.drawEllipse(QPointF(commit.x, commit.y), self.node_radius, self.node_radius)
             else:
                 if is_selected:
-                    blink_val = (math.sin(self.anim_frame * 2.0) + 1) / 2
+                    blink_val = (math.sin(self.clock.frame * 2.0) + 1) / 2
                     
                     glow_color = QColor(branch.color)
                     glow_color.setAlpha(150)
@@ -783,7 +922,7 @@ class GitFlowCanvas(QWidget):
                 tag_col = QColor('#1e293b')
                 if not is_match: tag_col.setAlpha(40)
                 painter.setPen(tag_col)
-                painter.setFont(QFont("Segoe UI", 8, QFont.Weight.Bold))
+                painter.setFont(self.tag_font)
                 painter.drawText(int(commit.x) - 15, int(commit.y) - 15, commit.is_tag)
 
             if commit.has_folder:
@@ -793,12 +932,23 @@ class GitFlowCanvas(QWidget):
                 painter.setPen(Qt.PenStyle.NoPen)
                 painter.drawEllipse(QPointF(commit.x + 8, commit.y - 8), 4, 4)
 
+    def event(self, event):
+        # Tooltip: tên commit + đoạn xem trước ghi chú (không phải đọc file ghi chú)
+        if event.type() == QEvent.Type.ToolTip:
+            nid = self.node_at(QPointF(event.pos()))
+            if nid:
+                commit = self.engine.all_commits[nid]
+                tip = f"{nid}: {commit.message}"
+                if commit.note_preview: tip += f"\n📝 {commit.note_preview}"
+                QToolTip.showText(event.globalPos(), tip, self)
+                return True
+            QToolTip.hideText()
+            event.ignore()
+            return True
+        return super().event(event)
+
     def mousePressEvent(self, event):
-        clicked_id = None
-        for nid, pos in self.node_positions.items():
-            if (event.position() - pos).manhattanLength() < 20: 
-                clicked_id = nid
-                break
+        clicked_id = self.node_at(event.position())
         
         if event.button() == Qt.MouseButton.LeftButton:
             self.selected_node_id = clicked_id
@@ -806,8 +956,8 @@ class GitFlowCanvas(QWidget):
                 self.trace_lineage(clicked_id)
                 self.node_selected.emit(self.engine, clicked_id)
             else:
-                self.highlighted_links.clear()
-                self.highlighted_nodes.clear()
+                self.highlighted_links = set()
+                self.highlighted_nodes = set()
                 self.node_selected.emit(None, "")
             self.update()
         elif event.button() == Qt.MouseButton.RightButton and clicked_id:
@@ -818,33 +968,8 @@ class GitFlowCanvas(QWidget):
             self.show_context_menu(event.globalPosition().toPoint())
 
     def trace_lineage(self, start_node_id):
-        self.highlighted_links.clear()
-        self.highlighted_nodes.clear()
-        queue = [start_node_id]
-        visited = {start_node_id}
-        self.highlighted_nodes.add(start_node_id)
-        while queue:
-            curr_id = queue.pop(0)
-            if curr_id not in self.engine.all_commits: continue
-            commit = self.engine.all_commits[curr_id]
-            for p in commit.parents:
-                self.highlighted_links.add((p.id, curr_id))
-                self.highlighted_nodes.add(p.id)
-                if p.id not in visited:
-                    visited.add(p.id)
-                    queue.append(p.id)
-        queue = [start_node_id]
-        visited_fwd = {start_node_id}
-        while queue:
-            curr_id = queue.pop(0)
-            if curr_id not in self.engine.all_commits: continue
-            commit = self.engine.all_commits[curr_id]
-            for child in commit.children:
-                self.highlighted_links.add((curr_id, child.id))
-                self.highlighted_nodes.add(child.id)
-                if child.id not in visited_fwd:
-                    visited_fwd.add(child.id)
-                    queue.append(child.id)
+        # Kết quả dùng chung từ cache của engine (frozenset), không dựng lại mỗi lần click
+        self.highlighted_nodes, self.highlighted_links = self.engine.lineage(start_node_id)
 
     def show_context_menu(self, pos):
         menu = QMenu(self)
@@ -877,11 +1002,21 @@ class GitFlowCanvas(QWidget):
 # ====================================================================
 
 class ProjectWrapper(QWidget):
+    # Dự án thu gọn quá lâu thì giải phóng engine + canvas (nạp lại khi mở ra)
+    UNLOAD_AFTER_MS = 2 * 60 * 1000
+
     def __init__(self, project_name, main_window):
         super().__init__()
         self.main_window = main_window
-        self.engine = ProjectEngine(project_name)
+        self.project_name = project_name
+        self.engine = None
+        self.canvas = None
+        self.note_worker = None
         self.is_minimized = True 
+        self.unload_timer = QTimer(self)
+        self.unload_timer.setSingleShot(True)
+        self.unload_timer.setInterval(self.UNLOAD_AFTER_MS)
+        self.unload_timer.timeout.connect(self.unload)
         
         self.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.MinimumExpanding)
         self.setFixedHeight(36)
@@ -905,9 +1040,12 @@ class ProjectWrapper(QWidget):
         
         icon = QLabel("📦")
         title = QLabel(project_name.upper())
+        self.lbl_summary = QLabel("")
+        self.lbl_summary.setStyleSheet("color: #94a3b8; font-weight: normal; font-size: 11px;")
+        self.set_summary(main_window.project_index.get(project_name))
         
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("🔍 Tìm (Msg, ID, Tag)...")
+        self.search_input.setPlaceholderText("🔍 Tìm (Msg, ID, Tag, Nhánh, Ghi chú)...")
         self.search_input.setFixedWidth(150)
         self.search_input.textChanged.connect(self.on_search_changed)
 
@@ -919,6 +1057,20 @@ class ProjectWrapper(QWidget):
         self.btn_end.setStyleSheet("QToolButton { border: 1px solid #cbd5e1; border-radius: 4px; padding: 2px 8px; background: white; color: #334155; } QToolButton:hover { background: #f8fafc; color: #0f172a; }")
         self.btn_end.clicked.connect(self.scroll_to_end)
 
+        self.btn_relayout = QToolButton()
+        self.btn_relayout.setText("↔ Gọn")
+        self.btn_relayout.setToolTip("Sắp xếp lại sơ đồ, thu hẹp khoảng trống")
+        self.btn_relayout.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_relayout.setStyleSheet(self.btn_end.styleSheet())
+        self.btn_relayout.clicked.connect(self.relayout)
+
+        self.btn_grep = QToolButton()
+        self.btn_grep.setText("🔎 Nội dung")
+        self.btn_grep.setToolTip("Tìm chuỗi trong file của các commit")
+        self.btn_grep.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_grep.setStyleSheet(self.btn_end.styleSheet())
+        self.btn_grep.clicked.connect(self.search_content)
+
         self.btn_min = QToolButton()
         self.btn_min.setText("+") 
         self.btn_min.setFixedSize(20, 20)
@@ -933,9 +1085,12 @@ class ProjectWrapper(QWidget):
 
         header_layout.addWidget(icon)
         header_layout.addWidget(title)
+        header_layout.addWidget(self.lbl_summary)
         header_layout.addSpacing(10)
         header_layout.addWidget(self.search_input)
+        header_layout.addWidget(self.btn_grep)
         header_layout.addStretch()
+        header_layout.addWidget(self.btn_relayout)
         header_layout.addWidget(self.btn_end)
         header_layout.addWidget(self.btn_min)
         header_layout.addWidget(self.btn_close)
@@ -949,11 +1104,6 @@ class ProjectWrapper(QWidget):
         self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.scroll_area.setFrameShape(QFrame.Shape.NoFrame)
         self.scroll_area.hide()
-        
-        self.canvas = GitFlowCanvas(self.engine)
-        self.canvas.node_selected.connect(self.main_window.update_sidebar)
-        self.scroll_area.setWidget(self.canvas)
-        
         self.layout.addWidget(self.scroll_area)
 
         # SIZE GRIP
@@ -962,9 +1112,72 @@ class ProjectWrapper(QWidget):
         sizegrip = QSizeGrip(self)
         bottom_bar.addWidget(sizegrip)
         bottom_bar.setContentsMargins(0, 0, 0, 0)
+
+    def set_summary(self, summary):
+        if not summary:
+            self.lbl_summary.setText("")
+            return
+        modified = datetime.datetime.fromtimestamp(summary["modified"]).strftime("%d/%m/%Y %H:%M") if summary["modified"] else "?"
+        self.lbl_summary.setText(f"{summary['commits']} commit · {len(summary['branches'])} nhánh · {modified}")
+        self.lbl_summary.setToolTip(", ".join(summary["branches"]))
+
+    def ensure_loaded(self):
+        # Chỉ nạp engine + canvas khi dự án được mở ra lần đầu
+        if self.engine: return self.engine
+        self.engine = ProjectEngine(self.project_name, DATA_ROOT_DIR, STORAGE_BACKEND)
+        self.canvas = GitFlowCanvas(self.engine)
+        self.canvas.node_selected.connect(self.main_window.update_sidebar)
+        self.canvas.set_filter(self.search_input.text())
+        self.load_note_texts()
+        self.scroll_area.setWidget(self.canvas)
+        self.main_window.project_index.update(self.engine)
+        self.set_summary(self.main_window.project_index.get(self.project_name))
+        return self.engine
+
+    def unload(self):
+        if not self.engine or not self.is_minimized: return
+        sidebar = self.main_window.sidebar
+        syncing = self.main_window.sync_worker and self.main_window.sync_worker.isRunning()
+        if sidebar.current_engine is self.engine or syncing:
+            # Sidebar vẫn đang hiện commit của dự án này / đang quét workspace -> giữ lại, thử lại sau
+            self.unload_timer.start()
+            return
+        sidebar.note_writer.flush()
+        self.engine.close()
+        self.main_window.project_index.update(self.engine)
+        self.set_summary(self.main_window.project_index.get(self.project_name))
+        self.canvas.clock.unsubscribe(self.canvas)
+        self.scroll_area.takeWidget().deleteLater()
+        self.engine = None
+        self.canvas = None
     
     def on_search_changed(self, text):
-        self.canvas.set_filter(text)
+        if self.canvas: self.canvas.set_filter(text)
+        self.load_note_texts()
+
+    def load_note_texts(self):
+        # Lọc lần đầu: index dựng ngay từ đoạn xem trước trong RAM, chữ đầy đủ của ghi chú dài đọc nền rồi bổ sung
+        engine = self.engine
+        if not engine or engine.note_texts_loaded or self.note_worker or not self.search_input.text(): return
+        worker = NoteTextWorker(engine)
+        def on_done():
+            self.note_worker = None
+            if self.engine is engine:
+                engine.index_note_texts(worker.result)
+                self.canvas.update()
+        worker.finished_signal.connect(on_done)
+        self.note_worker = worker
+        worker.start()
+
+    def search_content(self):
+        if self.is_minimized: self.toggle_content()
+        ContentSearchDialog(self).show()
+
+    def relayout(self):
+        engine = self.ensure_loaded()
+        old_width, new_width = engine.relayout()
+        self.canvas.update()
+        QMessageBox.information(self, "Sắp xếp", f"Chiều rộng sơ đồ: {old_width}px → {new_width}px")
 
     def scroll_to_end(self):
         if self.is_minimized: self.toggle_content()
@@ -974,6 +1187,8 @@ class ProjectWrapper(QWidget):
 
     def toggle_content(self):
         if self.is_minimized:
+            self.unload_timer.stop()
+            self.ensure_loaded()
             self.scroll_area.show()
             self.btn_min.setText("−")
             self.setMinimumHeight(200)
@@ -983,13 +1198,22 @@ class ProjectWrapper(QWidget):
             self.scroll_area.hide()
             self.btn_min.setText("+")
             self.setFixedHeight(36)
+            self.unload_timer.start()
         self.is_minimized = not self.is_minimized
 
     def delete_project(self):
-        res = QMessageBox.question(self, "Xóa", f"Xóa vĩnh viễn '{self.engine.project_name}'?", 
+        res = QMessageBox.question(self, "Xóa", f"Xóa vĩnh viễn '{self.project_name}'?", 
                                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if res == QMessageBox.StandardButton.Yes:
-            if os.path.exists(self.engine.project_dir): shutil.rmtree(self.engine.project_dir)
+            self.unload_timer.stop()
+            if self.note_worker: self.note_worker.wait()
+            if self.engine:
+                self.canvas.clock.unsubscribe(self.canvas)
+                if self.main_window.sidebar.current_engine is self.engine: self.main_window.update_sidebar(None, "")
+                self.engine.close()
+            project_dir = os.path.join(DATA_ROOT_DIR, self.project_name)
+            if os.path.exists(project_dir): shutil.rmtree(project_dir)
+            self.main_window.project_index.remove(self.project_name)
             self.setParent(None)
             self.deleteLater()
 
@@ -997,100 +1221,24 @@ class ProjectWrapper(QWidget):
         cid = self.canvas.selected_node_id
         if not cid: return
         eng = self.engine
-        commit = eng.all_commits[cid]
         
         if action.startswith('checkout_'):
             target_branch = action.replace('checkout_', '')
-            eng.current_branch_name = target_branch
+            eng.set_current_branch(target_branch)
             QMessageBox.information(self, "Checkout", f"Đã chuyển sang nhánh: {target_branch.upper()}")
             return
 
-        elif action == 'push_commit':
-            if eng.current_branch_name not in eng.branches:
-                if commit.branch_name in eng.branches:
-                     eng.current_branch_name = commit.branch_name
-                elif 'master' in eng.branches:
-                     eng.current_branch_name = 'master'
-                else:
-                     eng.current_branch_name = list(eng.branches.keys())[0]
-
-            nid = eng._get_new_commit_id()
-            target_branch_obj = eng.branches[eng.current_branch_name]
-            
-            c = Commit(nid, "WIP", eng.current_branch_name)
-            target_branch_obj.commit(c)
-            c.add_parent(commit)
-            commit.add_child(c)
-            eng.all_commits[nid] = c
-            eng.commit_x_map[nid] = eng.current_max_x + eng.x_step
-            eng.current_max_x += eng.x_step
-            
-            eng.link_commit_files(commit.id, nid)
-
-        elif action == 'create_feature':
-            name = f"feature/{eng.commit_counter}"
-            nid = eng._get_new_commit_id()
-            c = Commit(nid, "Start", name)
-            eng._create_new_branch(name, 'feature', c, commit)
-            eng.link_commit_files(commit.id, nid)
-            
-        elif action == 'create_develop':
-            if 'develop' not in eng.branches:
-                nid = eng._get_new_commit_id()
-                c = Commit(nid, "Dev Init", "develop")
-                eng._create_new_branch('develop', 'develop', c, commit)
-                eng.link_commit_files(commit.id, nid)
-            else:
-                QMessageBox.information(self, "Info", "Nhánh Develop đã tồn tại.")
-
-        elif action == 'create_hotfix':
-            name = f"hotfix/{eng.commit_counter}"
-            nid = eng._get_new_commit_id()
-            c = Commit(nid, "Hotfix", name)
-            eng._create_new_branch(name, 'hotfix', c, commit)
-            eng.link_commit_files(commit.id, nid)
-
-        elif action.startswith('merge_to_'):
-            target_name = action.replace('merge_to_', '')
-            if target_name in eng.branches:
-                target = eng.branches[target_name]
-                nid = eng._get_new_commit_id()
-                msg = f"Merge {commit.branch_name}"
-                mc = Commit(nid, msg, target.name)
-                target.commit(mc)
-                mc.add_parent(commit)
-                commit.add_child(mc)
-                eng.all_commits[nid] = mc
-                eng.current_max_x += eng.x_step
-                eng.commit_x_map[nid] = eng.current_max_x
-                eng.current_branch_name = target.name
-                eng.link_commit_files(commit.id, nid)
-            
-        elif action == 'delete_node':
-            if commit.children:
-                QMessageBox.warning(self, "Lỗi", "Không thể xóa node ở giữa (Node này đang có node con)!")
-                return
-            
-            for parent in commit.parents:
-                if commit in parent.children:
-                    parent.children.remove(commit)
-
-            if commit in eng.branches[commit.branch_name].commits:
-                eng.branches[commit.branch_name].commits.remove(commit)
-            
-            if cid in eng.all_commits:
-                del eng.all_commits[cid]
-            
-            if commit.source_id == commit.id:
-                path = eng.get_commit_folder_path(cid)
-                if os.path.exists(path): 
-                    try: shutil.rmtree(path)
-                    except: pass
-            
-            self.canvas.selected_node_id = None
+        try:
+            if action == 'push_commit': eng.push_commit(cid)
+            elif action.startswith('create_'): eng.create_branch(action.replace('create_', ''), cid)
+            elif action.startswith('merge_to_'): eng.merge_into(cid, action.replace('merge_to_', ''))
+            elif action == 'delete_node':
+                eng.remove_commit(cid)
+                self.canvas.selected_node_id = None
+        except ValueError as e:
+            QMessageBox.warning(self, "Lỗi", str(e))
+            return
 
-        eng.calculate_commit_positions()
-        eng.save_data()
         self.canvas.update()
         QTimer.singleShot(50, self.scroll_to_end)
 
@@ -1132,6 +1280,10 @@ class Sidebar(QFrame):
         btn_row.addWidget(self.btn_open)
         fb_layout.addLayout(btn_row)
 
+        self.chk_verify = QCheckBox("So sánh cả nội dung khi upload lại (chậm hơn)")
+        self.chk_verify.setStyleSheet("color: #64748b; font-size: 11px;")
+        fb_layout.addWidget(self.chk_verify)
+
         self.btn_vscode = QPushButton("📝 Edit in VS Code")
         self.btn_vscode.setStyleSheet("QPushButton { background-color: #0ea5e9; color: white; border: none; } QPushButton:hover { background-color: #0284c7; } QPushButton:disabled { background-color: #cbd5e1; }")
         self.btn_vscode.clicked.connect(self.edit_in_vscode)
@@ -1178,12 +1330,26 @@ class Sidebar(QFrame):
         toolbar.addStretch()
         layout.addLayout(toolbar)
 
-        self.txt_note = QTextEdit()
+        self.txt_note = NoteEdit()
         self.txt_note.setPlaceholderText("Nhập ghi chú... (Hỗ trợ ảnh, định dạng)")
         self.txt_note.setStyleSheet("border: 1px solid #cbd5e1; border-radius: 4px; background: white;")
-        self.txt_note.textChanged.connect(self.save_note) 
+        self.txt_note.textChanged.connect(self.on_note_changed) 
         layout.addWidget(self.txt_note)
 
+        # Gõ phím chỉ đánh dấu "có thay đổi"; ghi chú được lưu sau khi ngừng gõ một lúc,
+        # khi chuyển node hoặc khi thoát app - việc ghi đĩa chạy ở thread nền
+        self._note_dirty = False
+        self.note_timer = QTimer(self)
+        self.note_timer.setSingleShot(True)
+        self.note_timer.setInterval(800)
+        self.note_timer.timeout.connect(self.save_note)
+        self.note_writer = NoteWriter(self)
+        self.note_writer.flushed.connect(self.on_notes_flushed)
+
+        self.lbl_note_status = QLabel("")
+        self.lbl_note_status.setStyleSheet("color: #94a3b8; font-size: 10px;")
+        layout.addWidget(self.lbl_note_status)
+
         # 4. File Tree
         layout.addWidget(QLabel("📂 File trong commit:"))
         self.tree = QTreeWidget()
@@ -1209,15 +1375,30 @@ class Sidebar(QFrame):
     def insert_image(self):
         fname, _ = QFileDialog.getOpenFileName(self, 'Chọn ảnh', '.', "Images (*.png *.jpg *.jpeg *.bmp)")
         if fname:
-            uri = QUrl.fromLocalFile(fname).toString()
-            img_html = f'<br><img src="{uri}" width="200" /><br>'
+            if not self.current_engine: return
+            name = self.current_engine.add_asset(fname)
+            img_html = f'<br><img src="asset:{name}" width="200" /><br>'
             self.txt_note.insertHtml(img_html)
 
+    def on_note_changed(self):
+        if self.current_engine and self.current_node_id:
+            self._note_dirty = True
+            self.note_timer.start()
+
     def save_note(self):
-        if self.current_engine:
-            self.current_engine.update_note(self.current_node_id, self.txt_note.toHtml())
+        self.note_timer.stop()
+        if not self._note_dirty: return
+        self._note_dirty = False
+        if self.current_engine and self.current_node_id in self.current_engine.all_commits:
+            html_text = self.txt_note.toHtml()
+            self.current_engine.update_note(self.current_node_id, html_text, persist=False)
+            self.note_writer.submit(self.current_engine, self.current_node_id, html_text)
+
+    def on_notes_flushed(self, count):
+        self.lbl_note_status.setText(f"💾 Đã lưu ghi chú lúc {datetime.datetime.now():%H:%M:%S}")
 
     def update_view(self, engine, nid):
+        self.save_note()
         self.current_engine = engine
         self.current_node_id = nid
         self.tree.clear()
@@ -1232,10 +1413,15 @@ class Sidebar(QFrame):
             return
 
         commit = engine.all_commits[nid]
-        self.lbl_info.setText(f"PROJECT: {engine.project_name}\nBRANCH: {commit.branch_name}\nID: {nid}")
+        info = f"PROJECT: {engine.project_name}\nBRANCH: {commit.branch_name}\nID: {nid}"
+        if commit.has_folder:
+            count, total = engine.get_snapshot_stats(nid)
+            info += f"\nFILES: {count} ({format_size(total)})"
+        self.lbl_info.setText(info)
         
         self.txt_note.blockSignals(True)
-        self.txt_note.setHtml(commit.note) 
+        self.txt_note.engine = engine
+        self.txt_note.setHtml(engine.get_note(nid)) 
         self.txt_note.blockSignals(False)
         
         is_locked = len(commit.children) > 0
@@ -1248,80 +1434,87 @@ class Sidebar(QFrame):
             self.btn_up.setEnabled(True)
             self.lbl_lock.hide()
         
-        real_path = engine.resolve_storage_path(nid)
-        has_content = commit.has_folder and real_path and os.path.exists(real_path)
+        has_content = bool(engine.get_manifest(nid))
         
         self.btn_open.setEnabled(has_content)
         if not is_locked:
             self.btn_vscode.setEnabled(has_content)
         
         if has_content:
-            self.load_tree(real_path)
-
-    def load_tree(self, path):
-        root = QTreeWidgetItem(self.tree, [os.path.basename(path)])
-        root.setIcon(0, self.icon_provider.icon(QFileInfo(path)))
-        for r, d, f in os.walk(path):
+            self.load_tree(engine, nid)
+
+    def load_tree(self, engine, nid):
+        # Dựng cây file từ manifest, không cần đụng tới ổ đĩa
+        root = QTreeWidgetItem(self.tree, [nid])
+        folder_icon = self.icon_provider.icon(QFileIconProvider.IconType.Folder)
+        root.setIcon(0, folder_icon)
+        dir_items = {"": root}
+        for rel in sorted(engine.get_manifest(nid)):
+            parts = rel.split('/')
             curr = root
-            rel = os.path.relpath(r, path)
-            if rel != ".":
-                for part in rel.split(os.sep):
-                    found = None
-                    for i in range(curr.childCount()):
-                        if curr.child(i).text(0) == part:
-                            found = curr.child(i)
-                            break
-                    if not found:
-                        found = QTreeWidgetItem(curr, [part])
-                        found.setIcon(0, self.icon_provider.icon(QFileInfo(os.path.join(r))))
-                    curr = found
-            for file in f:
-                full_path = os.path.join(r, file)
-                item = QTreeWidgetItem(curr, [file])
-                item.setData(0, Qt.ItemDataRole.UserRole, full_path)
-                item.setIcon(0, self.icon_provider.icon(QFileInfo(full_path)))
+            for i in range(len(parts) - 1):
+                key = '/'.join(parts[:i + 1])
+                found = dir_items.get(key)
+                if not found:
+                    found = QTreeWidgetItem(curr, [parts[i]])
+                    found.setIcon(0, folder_icon)
+                    dir_items[key] = found
+                curr = found
+            item = QTreeWidgetItem(curr, [parts[-1]])
+            item.setData(0, Qt.ItemDataRole.UserRole, rel)
+            item.setIcon(0, self.icon_provider.icon(QFileInfo(parts[-1])))
         self.tree.expandAll()
 
     def show_tree_context_menu(self, pos):
         item = self.tree.itemAt(pos)
         if not item: return
-        fpath = item.data(0, Qt.ItemDataRole.UserRole)
-        if not fpath or not os.path.isfile(fpath): return
+        rel = item.data(0, Qt.ItemDataRole.UserRole)
+        if not rel: return
         menu = QMenu(self)
-        menu.addAction("👀 So sánh với bản cũ (Diff)", lambda: self.diff_file(fpath))
+        menu.addAction("👀 So sánh với bản cũ (Diff)", lambda: self.diff_file(rel))
         menu.exec(self.tree.mapToGlobal(pos))
 
-    def diff_file(self, current_file_path):
-        commit = self.current_engine.all_commits[self.current_node_id]
+    def diff_file(self, rel_path):
+        engine = self.current_engine
+        commit = engine.all_commits[self.current_node_id]
         if not commit.parents:
             QMessageBox.information(self, "Info", "Node này không có cha. Không thể so sánh.")
             return
 
-        parent = commit.parents[0]
-        parent_store_path = self.current_engine.resolve_storage_path(parent.id)
-        if not parent_store_path or not os.path.exists(parent_store_path):
+        # Commit merge: cho chọn so với cha chính, cha được merge vào hoặc merge base của hai cha
+        bases = [(f"Cha chính: {commit.parents[0].id}", commit.parents[0].id)]
+        if len(commit.parents) > 1:
+            other = commit.parents[1]
+            bases.append((f"Cha merge: {other.id}", other.id))
+            merge_base = engine.merge_base(commit.parents[0].id, other.id)
+            if merge_base: bases.append((f"Merge base: {merge_base}", merge_base))
+            label, ok = QInputDialog.getItem(self, "So sánh với", "Chọn phiên bản cũ:", [b[0] for b in bases], 0, False)
+            if not ok: return
+            base_id = dict(bases)[label]
+        else:
+            base_id = bases[0][1]
+
+        parent_files = engine.get_manifest(base_id)
+        if not parent_files:
             QMessageBox.warning(self, "Lỗi", "Không tìm thấy dữ liệu của node cha.")
             return
 
-        current_store_path = self.current_engine.resolve_storage_path(commit.id)
-        rel_path = os.path.relpath(current_file_path, current_store_path)
-        old_file_path = os.path.join(parent_store_path, rel_path)
-
-        if not os.path.exists(old_file_path):
+        if rel_path not in parent_files:
             QMessageBox.warning(self, "Lỗi", "File này không tồn tại trong phiên bản cũ.")
             return
 
         try:
-            with open(old_file_path, 'r', encoding='utf-8') as f: old_content = f.read()
-            with open(current_file_path, 'r', encoding='utf-8') as f: new_content = f.read()
-            DiffDialog(old_content, new_content, os.path.basename(current_file_path), self).exec()
+            old_content = engine.read_file(base_id, rel_path).decode('utf-8')
+            new_content = engine.read_file(commit.id, rel_path).decode('utf-8')
+            DiffDialog(old_content, new_content, os.path.basename(rel_path), self).exec()
         except Exception as e:
             QMessageBox.warning(self, "Lỗi", f"Không thể đọc file: {e}")
 
     def edit_file(self, item, col):
-        fpath = item.data(0, Qt.ItemDataRole.UserRole)
-        if fpath and os.path.isfile(fpath):
-            FileEditorDialog(fpath, self).exec()
+        rel = item.data(0, Qt.ItemDataRole.UserRole)
+        if rel:
+            if FileEditorDialog(self.current_engine, self.current_node_id, rel, self).exec():
+                self.update_view(self.current_engine, self.current_node_id)
 
     def upload(self):
         if not self.current_engine or not self.current_node_id:
@@ -1329,55 +1522,44 @@ class Sidebar(QFrame):
             return
         d = QFileDialog.getExistingDirectory(self, "Chọn Folder Code")
         if d:
-            commit = self.current_engine.all_commits[self.current_node_id]
-            commit.source_id = commit.id 
-            dst_path = self.current_engine.get_commit_folder_path(commit.id)
-            self.run_file_worker(d, dst_path, "Đang tải file lên...")
-
-    def run_file_worker(self, src, dst, title):
+            engine, nid = self.current_engine, self.current_node_id
+            def on_finished(worker):
+                engine.set_snapshot(nid, worker.result)
+                self.update_view(engine, nid)
+                engine.canvas.update()
+                QMessageBox.information(self, "Thành công", f"Xử lý file hoàn tất!\n\n{worker.report.summary()}")
+            worker = FileWorker(engine, nid, d, incremental=True, verify_hash=self.chk_verify.isChecked())
+            self.run_file_worker(worker, "Đang tải file lên...", on_finished)
+
+    def run_file_worker(self, worker, title, on_done):
+        self.main_window.wait_workspace_sync()  # Không dựng / nạp file trong lúc đang quét workspace
         pd = ModernProgressDialog(title, self)
         pd.show()
-        self.thread_worker = FileWorker(src, dst)
-        self.thread_worker.progress_signal.connect(pd.update_progress)
-        def on_finished():
-            pd.close()
-            commit = self.current_engine.all_commits[self.current_node_id]
-            commit.has_folder = True
-            self.current_engine.save_data()
-            self.update_view(self.current_engine, self.current_node_id)
-            self.current_engine.canvas.update()
-            QMessageBox.information(self, "Thành công", "Xử lý file hoàn tất!")
-        self.thread_worker.finished_signal.connect(on_finished)
-        self.thread_worker.error_signal.connect(lambda e: (pd.close(), QMessageBox.critical(self, "Lỗi", e)))
-        self.thread_worker.start()
+        self.thread_worker = worker
+        worker.progress_signal.connect(pd.update_progress)
+        worker.finished_signal.connect(lambda: (pd.close(), on_done(worker)))
+        worker.error_signal.connect(lambda e: (pd.close(), QMessageBox.critical(self, "Lỗi", e)))
+        worker.start()
 
     def open_folder(self):
         if not self.current_engine or not self.current_node_id: return
-        p = self.current_engine.resolve_storage_path(self.current_node_id)
-        if p and os.path.exists(p):
-            if sys.platform == 'win32': os.startfile(p)
-            else: subprocess.Popen(['xdg-open', p])
+        def on_done(worker):
+            p = worker.result
+            if p and os.path.exists(p):
+                if sys.platform == 'win32': os.startfile(p)
+                else: subprocess.Popen(['xdg-open', p])
+        self.run_file_worker(FileWorker(self.current_engine, self.current_node_id), "Đang chuẩn bị thư mục...", on_done)
 
     def edit_in_vscode(self):
         if not self.current_engine or not self.current_node_id: return
-        commit = self.current_engine.all_commits[self.current_node_id]
-        if commit.source_id != commit.id:
-            src_path = self.current_engine.resolve_storage_path(self.current_node_id)
-            dst_path = self.current_engine.get_commit_folder_path(commit.id)
-            pd = ModernProgressDialog("Đang tạo không gian làm việc...", self)
-            pd.show()
-            self.thread_worker = FileWorker(src_path, dst_path)
-            self.thread_worker.progress_signal.connect(pd.update_progress)
-            def on_finished_vscode():
-                pd.close()
-                commit.source_id = commit.id
-                self.current_engine.save_data()
-                self.update_view(self.current_engine, self.current_node_id)
-                self.launch_vscode(dst_path)
-            self.thread_worker.finished_signal.connect(on_finished_vscode)
-            self.thread_worker.start()
-        else:
-            self.launch_vscode(self.current_engine.get_commit_folder_path(commit.id))
+        engine, nid = self.current_engine, self.current_node_id
+        # Commit đang kế thừa file -> tách manifest riêng (chỉ danh sách) rồi dựng workspace
+        # bằng reflink từ kho object (filesystem không hỗ trợ thì copy): mỗi file là bản riêng, sửa thoải mái
+        engine.fork_snapshot(nid)
+        def on_finished_vscode(worker):
+            self.update_view(engine, nid)
+            self.launch_vscode(worker.result)
+        self.run_file_worker(FileWorker(engine, nid), "Đang tạo không gian làm việc...", on_finished_vscode)
 
     def launch_vscode(self, path):
         if os.path.exists(path):
@@ -1388,6 +1570,7 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         if not os.path.exists(DATA_ROOT_DIR): os.makedirs(DATA_ROOT_DIR)
+        self.project_index = ProjectIndex(DATA_ROOT_DIR)
 
         self.setWindowTitle("Git Flow Ultimate - Sync Edition")
         self.resize(1300, 800) 
@@ -1405,6 +1588,20 @@ class MainWindow(QMainWindow):
         action_restore.triggered.connect(self.restore_data)
         drive_menu.addAction(action_restore)
 
+        git_menu = menubar.addMenu("🐙 Git")
+        action_import = QAction("📥 Nhập lịch sử từ repo Git...", self)
+        action_import.triggered.connect(self.import_git_repo)
+        git_menu.addAction(action_import)
+        action_export = QAction("📤 Xuất dự án ra repo Git...", self)
+        action_export.triggered.connect(self.export_git_repo)
+        git_menu.addAction(action_export)
+
+        settings_menu = menubar.addMenu("⚙️ Cài đặt")
+        self.action_sqlite = QAction("🗄️ Lưu dự án bằng SQLite", self, checkable=True)
+        self.action_sqlite.setChecked(STORAGE_BACKEND == 'sqlite')
+        self.action_sqlite.toggled.connect(self.toggle_sqlite_storage)
+        settings_menu.addAction(self.action_sqlite)
+
         # --- GIAO DIỆN CHÍNH ---
         main_split = QSplitter(Qt.Orientation.Horizontal)
         left_widget = QWidget()
@@ -1436,6 +1633,10 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(main_split)
         self.load_projects()
 
+        # Workspace chỉ bị sửa từ ngoài app -> đồng bộ khi người dùng quay lại app, ở thread nền
+        self.sync_worker = None
+        QApplication.instance().applicationStateChanged.connect(self.on_app_state_changed)
+
     def backup_data(self):
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         default_name = f"GitFlow_Backup_{timestamp}.zip"
@@ -1448,13 +1649,27 @@ class MainWindow(QMainWindow):
                 pd.show()
                 QApplication.processEvents()
                 
+                # Dự án lấy danh sách file từ manifest; file lẻ ở thư mục gốc thì lấy nguyên
+                entries = []
+                wrappers = {w.project_name: w for w in self.iter_wrappers()}
+                for entry in os.scandir(DATA_ROOT_DIR):
+                    if entry.name in wrappers:
+                        # Dự án chưa mở thì nạp tạm engine (không dựng canvas) chỉ để lấy danh sách file
+                        engine = wrappers[entry.name].engine or ProjectEngine(entry.name, DATA_ROOT_DIR, STORAGE_BACKEND)
+                        entries.extend((p, f"{entry.name}/{rel}") for p, rel in engine.backup_files())
+                        if engine is not wrappers[entry.name].engine: engine.close()
+                    elif entry.is_dir():
+                        entries.extend((p, f"{entry.name}/{rel}") for p, rel, st in scan_tree(entry.path))
+                    else:
+                        entries.append((entry.path, entry.name))
+
                 with zipfile.ZipFile(file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for root, dirs, files in os.walk(DATA_ROOT_DIR):
-                        for file in files:
-                            abs_path = os.path.join(root, file)
-                            rel_path = os.path.relpath(abs_path, DATA_ROOT_DIR)
-                            zipf.write(abs_path, rel_path)
-                            
+                    for i, (abs_path, rel_path) in enumerate(entries, 1):
+                        zipf.write(abs_path, rel_path)
+                        if i % 200 == 0 or i == len(entries):
+                            pd.update_progress(i, len(entries), rel_path)
+                            QApplication.processEvents()
+
                 pd.close()
                 QMessageBox.information(self, "Thành công", f"Đã backup dữ liệu tới:\n{file_path}\n\n(Dữ liệu sẽ tự động lên mây nếu bạn lưu trong Google Drive)")
             except Exception as e:
@@ -1473,6 +1688,9 @@ class MainWindow(QMainWindow):
                     pd.show()
                     QApplication.processEvents()
 
+                    for w in self.iter_wrappers():
+                        w.unload_timer.stop()
+                        if w.engine: w.engine.close()
                     if os.path.exists(DATA_ROOT_DIR):
                         shutil.rmtree(DATA_ROOT_DIR)
                     os.makedirs(DATA_ROOT_DIR)
@@ -1485,29 +1703,122 @@ class MainWindow(QMainWindow):
                     
                     for i in reversed(range(self.proj_layout.count())): 
                         self.proj_layout.itemAt(i).widget().setParent(None)
+                    self.project_index = ProjectIndex(DATA_ROOT_DIR)
                     self.load_projects()
                     
                 except Exception as e:
                     QMessageBox.critical(self, "Lỗi Restore", str(e))
 
+    def toggle_sqlite_storage(self, checked):
+        global STORAGE_BACKEND
+        STORAGE_BACKEND = 'sqlite' if checked else 'json'
+        try:
+            update_settings(storage_backend=STORAGE_BACKEND)
+        except Exception as e:
+            QMessageBox.warning(self, "Lỗi Config", f"Không thể lưu cấu hình: {e}")
+        if not checked:
+            QMessageBox.information(self, "Lưu trữ", "Dự án mới sẽ dùng data.json.\nDự án đã chuyển sang SQLite vẫn giữ nguyên data.sqlite.")
+            return
+        # Ghi chú đang chờ phải xuống đĩa trước khi đổi backend
+        self.sidebar.save_note()
+        self.sidebar.note_writer.flush()
+        migrated = [w.project_name for w in self.iter_wrappers()
+                    if (w.engine.migrate_storage('sqlite') if w.engine else migrate_json_to_sqlite(os.path.join(DATA_ROOT_DIR, w.project_name)))]
+        QMessageBox.information(self, "Lưu trữ", f"Đã chuyển {len(migrated)} dự án sang SQLite.")
+
     def add_project(self):
         name, ok = QInputDialog.getText(self, "Tạo Dự Án", "Tên dự án (không dấu):")
         if ok and name:
             safe = "".join([c for c in name if c.isalnum() or c=='_']).strip()
-            self.create_wrapper(safe)
+            self.create_wrapper(safe).toggle_content()
+
+    def import_git_repo(self):
+        repo = QFileDialog.getExistingDirectory(self, "Chọn thư mục repo Git")
+        if not repo: return
+        name, ok = QInputDialog.getText(self, "Nhập từ Git", "Tên dự án mới (không dấu):",
+                                        text="".join(c for c in os.path.basename(repo) if c.isalnum() or c == '_'))
+        name = "".join(c for c in name if c.isalnum() or c == '_').strip()
+        if not ok or not name: return
+        if os.path.exists(os.path.join(DATA_ROOT_DIR, name)):
+            QMessageBox.warning(self, "Lỗi", f"Dự án {name} đã tồn tại.")
+            return
+        revs, ok = QInputDialog.getText(self, "Nhập từ Git",
+                                        "Dựng sẵn file cho commit nào? (tag / nhánh / sha, cách nhau bởi dấu cách, bỏ trống = không)")
+        if not ok: return
+        def on_done(worker):
+            self.create_wrapper(name).toggle_content()
+            QMessageBox.information(self, "Thành công", f"Đã nhập {worker.result} commit vào dự án {name}.")
+        self.sidebar.run_file_worker(GitImportWorker(name, repo, revs.split()), "Đang nhập lịch sử Git...", on_done)
+
+    def export_git_repo(self):
+        wrappers = {w.project_name: w for w in self.iter_wrappers()}
+        if not wrappers: return
+        current = self.sidebar.current_engine.project_name if self.sidebar.current_engine else None
+        names = sorted(wrappers)
+        name, ok = QInputDialog.getItem(self, "Xuất ra Git", "Dự án:", names,
+                                        names.index(current) if current in wrappers else 0, False)
+        if not ok: return
+        repo = QFileDialog.getExistingDirectory(self, "Chọn thư mục repo Git đích (repo mới hoặc repo trống)")
+        if not repo: return
+        # Ghi chú đang chờ ghi phải xuống đĩa trước khi đọc lại làm message (wait() chỉ dùng lúc thoát)
+        self.sidebar.save_note()
+        self.sidebar.note_writer.flush()
+        w = wrappers[name]
+        w.ensure_loaded()
+        def on_done(worker):
+            QMessageBox.information(self, "Thành công", f"Đã xuất {worker.result} commit của {name} vào {repo}.")
+        self.sidebar.run_file_worker(GitExportWorker(w.engine, repo), "Đang xuất sang Git...", on_done)
 
     def load_projects(self):
-        for name in os.listdir(DATA_ROOT_DIR):
-            if os.path.isdir(os.path.join(DATA_ROOT_DIR, name)):
-                self.create_wrapper(name)
+        names = [name for name in os.listdir(DATA_ROOT_DIR) if os.path.isdir(os.path.join(DATA_ROOT_DIR, name))]
+        self.project_index.fill_missing(DATA_ROOT_DIR, names)
+        for name in names:
+            self.create_wrapper(name)
+
+    def iter_wrappers(self):
+        for i in range(self.proj_layout.count()):
+            w = self.proj_layout.itemAt(i).widget()
+            if isinstance(w, ProjectWrapper): yield w
 
     def create_wrapper(self, name):
         w = ProjectWrapper(name, self)
         self.proj_layout.addWidget(w)
+        return w
 
     def update_sidebar(self, engine, nid):
         self.sidebar.update_view(engine, nid)
 
+    def on_app_state_changed(self, state):
+        if state == Qt.ApplicationState.ApplicationActive: self.sync_workspaces()
+
+    def sync_workspaces(self):
+        engines = [w.engine for w in self.iter_wrappers() if w.engine]
+        busy = self.sidebar.thread_worker and self.sidebar.thread_worker.isRunning()
+        if not engines or busy or (self.sync_worker and self.sync_worker.isRunning()): return
+        worker = WorkspaceSyncWorker(engines)
+        def on_done():
+            # Sidebar đang hiện commit của dự án vừa đổi -> vẽ lại cây file / thống kê
+            engine, nid = self.sidebar.current_engine, self.sidebar.current_node_id
+            if worker.result and engine in engines and nid in engine.all_commits: self.sidebar.update_view(engine, nid)
+        worker.finished_signal.connect(on_done)
+        self.sync_worker = worker
+        worker.start()
+
+    def wait_workspace_sync(self):
+        if self.sync_worker: self.sync_worker.wait()
+
+    def closeEvent(self, event):
+        # Đẩy nốt ghi chú đang chờ xuống đĩa trước khi thoát
+        self.sidebar.save_note()
+        self.sidebar.note_writer.wait()
+        self.wait_workspace_sync()
+        for w in self.iter_wrappers():
+            if w.note_worker: w.note_worker.wait()
+            if w.engine:
+                w.engine.close()
+                self.project_index.update(w.engine)
+        super().closeEvent(event)
+
 if __name__ == '__main__':
     # 1. Fix ID cho Taskbar Windows
     try:
@@ -0,0 +1,179 @@
+"""
+Dòng lệnh cho GitFlow: chạy thao tác trên dự án mà không cần mở giao diện (không import Qt).
+
+    python gitflow_cli.py [--data DIR] [--sqlite] PROJECT LỆNH ...
+
+Lệnh:
+    log [-b NHÁNH] [-n SỐ]         lịch sử commit (mới nhất trước)
+    branches                        danh sách nhánh và head
+    commit REF [-m MSG]             commit mới nối tiếp REF trên nhánh hiện tại
+    branch feature|hotfix|develop REF
+    merge REF NHÁNH                 merge REF vào NHÁNH
+    checkout NHÁNH
+    attach REF FOLDER               nạp folder vào commit (như nút Upload)
+    delete REF
+    import REPO [-s REV ...]        nhập lịch sử repo git (REV: commit cần dựng luôn snapshot file)
+    export REPO                     xuất dự án sang repo git qua `git fast-import` ('-' = in luồng ra stdout)
+    check                           kiểm tra chỉ mục tổ tiên (generation, chuỗi cha chính) khớp với bản dựng lại
+    batch [FILE]                    mỗi dòng một lệnh ở trên (FILE bỏ trống hoặc '-' = stdin), '#' là chú thích
+
+REF là id commit, tên nhánh (= head của nhánh) hoặc '@' (commit vừa tạo ở lệnh trước).
+Mọi lệnh trong một lần chạy được gom vào engine.batch(): dữ liệu chỉ ghi một lần khi kết thúc.
+"""
+import sys
+import os
+import argparse
+import shlex
+
+from gitflow_engine import STORAGE_BACKEND, default_data_root, load_settings, format_size, ProjectEngine, ProjectIndex
+from gitflow_git import GitImporter, GitExporter
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gitflow_cli.py", description="GitFlow không giao diện")
+    parser.add_argument("--data", help="thư mục dữ liệu (mặc định: GITFLOW_DATA / settings.json)")
+    parser.add_argument("--sqlite", action="store_true", help="dùng SQLite cho dự án mới / chuyển dự án sang SQLite")
+    parser.add_argument("project")
+    add_commands(parser)
+    return parser
+
+def add_commands(parser):
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("log")
+    p.add_argument("-b", "--branch")
+    p.add_argument("-n", type=int, default=0)
+    sub.add_parser("branches")
+    p = sub.add_parser("commit")
+    p.add_argument("ref")
+    p.add_argument("-m", "--message", default="WIP")
+    p = sub.add_parser("branch")
+    p.add_argument("kind", choices=sorted(ProjectEngine.BRANCH_KINDS))
+    p.add_argument("ref")
+    p = sub.add_parser("merge")
+    p.add_argument("ref")
+    p.add_argument("into")
+    p = sub.add_parser("checkout")
+    p.add_argument("name")
+    p = sub.add_parser("attach")
+    p.add_argument("ref")
+    p.add_argument("folder")
+    p = sub.add_parser("delete")
+    p.add_argument("ref")
+    p = sub.add_parser("import")
+    p.add_argument("repo")
+    p.add_argument("-s", "--snapshot", action="append", default=[])
+    p = sub.add_parser("export")
+    p.add_argument("repo")
+    sub.add_parser("check")
+    p = sub.add_parser("batch")
+    p.add_argument("file", nargs="?", default="-")
+
+class LineParser(argparse.ArgumentParser):
+    # Lỗi cú pháp một dòng batch -> ValueError thay vì in usage rồi thoát (exit_on_error không phủ hết mọi lỗi)
+    def error(self, message):
+        raise ValueError(message)
+
+class Session:
+    def __init__(self, engine, out=sys.stdout):
+        self.engine = engine
+        self.out = out
+        self.last = None
+        self.line_parser = LineParser(prog="batch")
+        add_commands(self.line_parser)
+
+    def resolve(self, ref):
+        engine = self.engine
+        if ref == '@':
+            if not self.last: raise ValueError("'@': chưa có commit nào được tạo")
+            return self.last
+        if ref in engine.all_commits: return ref
+        if ref in engine.branches: return engine.branches[ref].head.id
+        raise ValueError(f"Không tìm thấy commit / nhánh: {ref}")
+
+    def created(self, commit_id):
+        self.last = commit_id
+        print(commit_id, file=self.out)
+
+    def run(self, args):
+        engine = self.engine
+        cmd = args.command
+        if cmd == "log":
+            commits = engine.all_commits.values()
+            if args.branch: commits = [c for c in commits if c.branch_name == args.branch]
+            commits = sorted(commits, key=lambda c: (engine.generation.get(c.id, 0), c.x), reverse=True)
+            for c in commits[:args.n or None]:
+                parents = ",".join(p.id for p in c.parents)
+                extra = f" [{c.is_tag}]" if c.is_tag else ""
+                if c.has_folder:
+                    count, total = engine.get_snapshot_stats(c.id)
+                    extra += f" ({count} file, {format_size(total)})"
+                print(f"{c.id}\t{c.branch_name}\t{parents or '-'}\t{c.message}{extra}", file=self.out)
+        elif cmd == "branches":
+            for name, branch in engine.branches.items():
+                mark = "*" if name == engine.current_branch_name else " "
+                print(f"{mark} {name}\t{branch.head.id}\t{len(branch.commits)} commit", file=self.out)
+        elif cmd == "commit":
+            self.created(engine.push_commit(self.resolve(args.ref), args.message))
+        elif cmd == "branch":
+            self.created(engine.create_branch(args.kind, self.resolve(args.ref)))
+        elif cmd == "merge":
+            self.created(engine.merge_into(self.resolve(args.ref), args.into))
+        elif cmd == "checkout":
+            if args.name not in engine.branches: raise ValueError(f"Không có nhánh: {args.name}")
+            engine.set_current_branch(args.name)
+        elif cmd == "attach":
+            if not os.path.isdir(args.folder): raise ValueError(f"Không phải thư mục: {args.folder}")
+            report = engine.attach_folder(self.resolve(args.ref), args.folder)
+            print(report.summary(), file=self.out)
+        elif cmd == "delete":
+            engine.remove_commit(self.resolve(args.ref))
+        elif cmd == "import":
+            def progress(done, total, label): print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+            count = GitImporter(engine, args.repo, progress).run(args.snapshot)
+            print(f"\n{count} commit", file=sys.stderr)
+        elif cmd == "export":
+            def progress(done, total, label): print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+            exporter = GitExporter(engine, progress)
+            if args.repo == "-":
+                self.out.flush()
+                count = exporter.write(sys.stdout.buffer)
+                sys.stdout.buffer.flush()
+            else: count = exporter.export_to_repo(args.repo)
+            print(f"\n{count} commit", file=sys.stderr)
+        elif cmd == "check":
+            bad = engine.check_ancestry_index()
+            if bad: raise ValueError(f"chỉ mục tổ tiên lệch ở {len(bad)} commit: {' '.join(bad[:20])}")
+            print(f"OK ({len(engine.all_commits)} commit)", file=self.out)
+        elif cmd == "batch":
+            f = sys.stdin if args.file == "-" else open(args.file, 'r', encoding='utf-8')
+            try:
+                for lineno, line in enumerate(f, 1):
+                    words = shlex.split(line, comments=True)
+                    if not words: continue
+                    try:
+                        line_args = self.line_parser.parse_args(words)
+                        if line_args.command == "batch": raise ValueError("batch lồng nhau")
+                        self.run(line_args)
+                    except (ValueError, KeyError) as e:
+                        raise ValueError(f"dòng {lineno}: {e}") from e
+            finally:
+                if f is not sys.stdin: f.close()
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    data_root = args.data or default_data_root()
+    os.makedirs(data_root, exist_ok=True)
+    backend = 'sqlite' if args.sqlite else load_settings().get('storage_backend', STORAGE_BACKEND)
+    engine = ProjectEngine(args.project, data_root, backend)
+    try:
+        with engine.batch():
+            Session(engine).run(args)
+    except (ValueError, KeyError, OSError) as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.close()
+        ProjectIndex(data_root).update(engine)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
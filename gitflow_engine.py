@@ -0,0 +1,2115 @@
+"""
+Lõi GitFlow không phụ thuộc giao diện: commit / nhánh, lưu trữ, kho object, chỉ mục và ProjectEngine.
+app.py (giao diện PyQt6) và gitflow_cli.py (dòng lệnh, chạy batch) dùng chung module này;
+import module này không kéo theo Qt.
+"""
+import sys
+import os
+import time
+import shutil
+import json
+import array
+import struct
+import html
+import hashlib
+import heapq
+import threading
+import errno
+import re
+import math
+import sqlite3
+import stat
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ====================================================================
+# CẤU HÌNH PATH
+# ====================================================================
+
+
+# Xác định đường dẫn gốc (đã sửa để chạy được cả file exe và code thường)
+if getattr(sys, 'frozen', False):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Đường dẫn file cấu hình để lưu lựa chọn của người dùng
+CONFIG_FILE = os.path.join(BASE_DIR, 'settings.json')
+
+# Kiểu lưu trữ dữ liệu dự án: 'json' (data.json + journal) hoặc 'sqlite' (data.sqlite)
+STORAGE_BACKEND = 'json'
+
+# Bảng màu Neon rực rỡ
+BRANCH_COLORS = {
+    'master':  {'node': '#00b8e6', 'lane': '#e0f7fa', 'line': '#00b8e6'}, # Cyan
+    'hotfix':  {'node': '#ff0055', 'lane': '#ffebee', 'line': '#ff0055'}, # Red
+    'release': {'node': '#ff9900', 'lane': '#fff3e0', 'line': '#ff9900'}, # Orange
+    'develop': {'node': '#aa00ff', 'lane': '#f3e5f5', 'line': '#aa00ff'}, # Purple
+    'feature': {'node': '#00cc66', 'lane': '#e8f5e9', 'line': '#00cc66'}  # Green
+}
+
+def branch_color_key(name):
+    # "hotfix/12" -> hotfix, "main" -> master; nhánh khác dùng màu feature
+    key = name.split('/', 1)[0].lower()
+    if key == 'main': return 'master'
+    return key if key in BRANCH_COLORS else 'feature'
+
+def load_settings():
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            pass # Lỗi đọc file thì bỏ qua, coi như chưa có
+    return {}
+
+def update_settings(**values):
+    config = load_settings()
+    config.update(values)
+    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+def default_data_root():
+    # Chạy không có giao diện: biến môi trường GITFLOW_DATA, rồi thư mục đã chọn trong settings.json,
+    # cuối cùng là GitFlow_Data cạnh app (giống khi người dùng bấm Cancel lúc chọn thư mục)
+    # Biến môi trường là chỉ định rõ ràng -> dùng luôn kể cả khi thư mục chưa có (CLI tự tạo)
+    if os.environ.get('GITFLOW_DATA'): return os.environ['GITFLOW_DATA']
+    path = load_settings().get('data_root_dir')
+    if path and os.path.isdir(path): return path
+    return os.path.join(BASE_DIR, 'GitFlow_Data')
+
+def format_size(num_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+# ====================================================================
+# OBJECT STORE (lưu nội dung file theo hash)
+# ====================================================================
+
+# Lỗi cho biết kernel/filesystem không hỗ trợ kiểu copy này -> chuyển sang cách khác
+_UNSUPPORTED_COPY_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM}
+_kernel_copy_modes = {
+    'copy_file_range': hasattr(os, 'copy_file_range'),
+    'sendfile': hasattr(os, 'sendfile') and sys.platform.startswith('linux'),
+}
+
+def _kernel_copy(mode, fsrc, fdst, size):
+    src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+    offset = 0
+    while offset < size:
+        if mode == 'copy_file_range':
+            sent = os.copy_file_range(src_fd, dst_fd, size - offset)
+        else:
+            sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0: break
+        offset += sent
+
+def fast_copy(src, dst):
+    """Copy nội dung src -> dst, ưu tiên copy phía kernel (copy_file_range/sendfile), không được thì copy qua buffer."""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        for mode in ('copy_file_range', 'sendfile'):
+            if not size or not _kernel_copy_modes[mode]: continue
+            try:
+                _kernel_copy(mode, fsrc, fdst, size)
+                return
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_COPY_ERRNOS: raise
+                _kernel_copy_modes[mode] = False
+                fsrc.seek(0); fdst.seek(0); fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, BlobStore.CHUNK_SIZE)
+
+# Workspace được dựng bằng reflink nếu filesystem hỗ trợ, không thì copy: mỗi file luôn là bản riêng, ghi được
+_UNSUPPORTED_LINK_ERRNOS = _UNSUPPORTED_COPY_ERRNOS | {errno.ENOTTY, getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)}
+_workspace_link_modes = {
+    'reflink': sys.platform.startswith('linux') or sys.platform == 'darwin',
+}
+
+def _reflink(src, dst):
+    if sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+        os.chmod(dst, 0o644)  # clonefile giữ nguyên quyền read-only của blob
+    else:
+        import fcntl
+        FICLONE = 0x40049409
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def clone_file(src, dst):
+    """
+    Tạo dst có nội dung như src, trả về cách đã dùng:
+    - 'reflink': copy-on-write thật sự của filesystem (btrfs, xfs, APFS...), sửa thoải mái.
+    - 'copy': copy thật, khi filesystem không hỗ trợ reflink (ext4, NTFS...).
+    """
+    if _workspace_link_modes['reflink']:
+        try:
+            _reflink(src, dst)
+            return 'reflink'
+        except OSError as e:
+            if os.path.exists(dst): os.remove(dst)
+            if e.errno not in _UNSUPPORTED_LINK_ERRNOS: raise
+            _workspace_link_modes['reflink'] = False
+    fast_copy(src, dst)
+    return 'copy'
+
+def remove_tree(path):
+    def on_error(func, failed_path, exc_info):
+        os.chmod(failed_path, 0o644)
+        func(failed_path)
+    shutil.rmtree(path, onerror=on_error)
+
+def scan_tree(root):
+    """Duyệt cây thư mục một lần duy nhất, trả về (đường dẫn, đường dẫn tương đối '/', stat) cho từng file."""
+    stack = [(root, "")]
+    while stack:
+        path, prefix = stack.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                rel = prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel + '/'))
+                elif entry.is_file():
+                    yield entry.path, rel, entry.stat()
+
+class TransferEngine:
+    """
+    Xử lý song song từng file bằng thread pool có giới hạn, trong khi nguồn việc (items)
+    vẫn đang được sinh ra (vd: đang duyệt cây thư mục). Tiến độ được gom lại và chỉ báo
+    tối đa mỗi PROGRESS_INTERVAL giây, tránh làm ngập event loop của GUI.
+    """
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, progress=None, max_workers=None):
+        self.progress = progress
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 4) * 2)
+        self.max_pending = self.max_workers * 4
+
+    def run(self, items, fn, on_result, label=str):
+        # on_result chạy trên thread gọi run() nên không cần khóa khi gom kết quả
+        done = discovered = 0
+        last_report = 0.0
+        last_label = ""
+        pending = set()
+
+        def drain(return_when):
+            nonlocal done, last_report, last_label
+            finished, still_pending = wait(pending, return_when=return_when)
+            for fut in finished:
+                result = fut.result()
+                on_result(result)
+                last_label = label(result)
+                done += 1
+            now = time.monotonic()
+            if self.progress and now - last_report >= self.PROGRESS_INTERVAL:
+                last_report = now
+                self.progress(done, discovered, last_label)
+            return still_pending
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            try:
+                for item in items:
+                    pending.add(pool.submit(fn, item))
+                    discovered += 1
+                    if len(pending) >= self.max_pending:
+                        pending = drain(FIRST_COMPLETED)
+                while pending:
+                    pending = drain(FIRST_COMPLETED)
+            except BaseException:
+                for fut in pending: fut.cancel()
+                raise
+        if self.progress: self.progress(done, discovered, last_label)
+        return done
+
+class BlobStore:
+    """
+    Kho nội dung file dạng content-addressable: mỗi nội dung chỉ lưu đúng một lần
+    tại Objects/<2 ký tự đầu hash>/<phần còn lại>. Blob là bất biến (read-only).
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root):
+        self.root = root
+        if not os.path.exists(root): os.makedirs(root)
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def hash_file(self, path):
+        with open(path, 'rb') as f:
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def put_file(self, path, digest=None):
+        # Hash trước, chỉ ghi khi chưa có -> file trùng nội dung không tốn thêm đĩa
+        digest = digest or self.hash_file(path)
+        if not self.has(digest):
+            self._store(digest, lambda tmp: fast_copy(path, tmp))
+        return digest
+
+    def put_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.has(digest):
+            def write(tmp):
+                with open(tmp, 'wb') as f: f.write(data)
+            self._store(digest, write)
+        return digest
+
+    def _store(self, digest, writer):
+        target = self.blob_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        writer(tmp)
+        os.chmod(tmp, 0o444)
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            # Thread khác vừa ghi cùng nội dung -> giữ bản đã có
+            if not os.path.exists(target): raise
+            os.chmod(tmp, 0o644)
+            os.remove(tmp)
+
+    def read(self, digest):
+        with open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    def materialize(self, digest, dst):
+        # Dựng dst (bản riêng, ghi được) từ blob bằng cách rẻ nhất
+        return clone_file(self.blob_path(digest), dst)
+
+    def verify(self, digest):
+        return self.has(digest) and self.hash_file(self.blob_path(digest)) == digest
+
+    def remove(self, digest):
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            os.chmod(path, 0o644)
+            os.remove(path)
+
+    def iter_digests(self):
+        for prefix in os.listdir(self.root):
+            sub = os.path.join(self.root, prefix)
+            if not os.path.isdir(sub): continue
+            for name in os.listdir(sub):
+                if not name.endswith('.tmp'): yield prefix + name
+
+def make_thumbnail(src, dst, width):
+    # QImageReader thu nhỏ ngay khi giải mã (JPEG) -> không phải giữ ảnh gốc full-size trong RAM.
+    # Chỉ giao diện mới cần ảnh thu nhỏ nên Qt được import tại đây, không ở đầu module.
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QImageReader
+    reader = QImageReader(src)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and size.width() > width:
+        reader.setScaledSize(size.scaled(width, size.height() * width // size.width() + 1, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull(): return False
+    tmp = f"{dst}.{threading.get_ident()}.tmp.png"
+    image.save(tmp, "PNG")
+    os.replace(tmp, dst)
+    return True
+
+class SyncReport:
+    """Thống kê một lần đồng bộ: bao nhiêu file/bytes phải chép, bao nhiêu được bỏ qua."""
+    def __init__(self):
+        self.copied_files = 0; self.copied_bytes = 0
+        self.skipped_files = 0; self.skipped_bytes = 0
+        self.linked_files = 0; self.linked_bytes = 0
+        self.removed_files = 0
+
+    def copy(self, size):
+        self.copied_files += 1
+        self.copied_bytes += size
+
+    def link(self, size):
+        self.linked_files += 1
+        self.linked_bytes += size
+
+    def skip(self, size):
+        self.skipped_files += 1
+        self.skipped_bytes += size
+
+    def summary(self):
+        return (f"Đã chép: {self.copied_files} file ({format_size(self.copied_bytes)})\n"
+                f"Bỏ qua (không đổi): {self.skipped_files} file ({format_size(self.skipped_bytes)})\n"
+                f"Liên kết (không tốn thêm đĩa): {self.linked_files} file ({format_size(self.linked_bytes)})\n"
+                f"Đã xóa: {self.removed_files} file")
+
+# ====================================================================
+# ENGINE CORE
+# ====================================================================
+
+class OperationJournal:
+    """
+    Nhật ký thao tác append-only (JSON lines) nằm cạnh data.json.
+    Mỗi thao tác chỉ ghi thêm một dòng (O(1)); định kỳ engine gộp nhật ký vào data.json (compaction).
+    Mỗi dòng có số thứ tự (seq) để khi load chỉ phát lại những thao tác mới hơn snapshot.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, entries):
+        lines = "".join(json.dumps(e, ensure_ascii=False, separators=(',', ':')) + "\n" for e in entries)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+            self.count += len(entries)
+
+    def read(self):
+        if not os.path.exists(self.path): return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: break  # dòng cuối bị ghi dở (app tắt đột ngột) -> bỏ
+                yield entry
+
+    def reset(self):
+        with self._lock:
+            open(self.path, 'w').close()
+            self.count = 0
+
+def file_stamp(*paths):
+    # (mtime_ns, size) của các file; file chưa có -> (0, 0)
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.extend((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.extend((0, 0))
+    return stamp
+
+def replay_op(data, entry):
+    # Áp một thao tác lên dữ liệu thô (dạng data.json). Phát lại nhiều lần vẫn ra cùng kết quả.
+    commits = data["commits"]
+    op = entry["op"]
+    if op == "add_commit":
+        commits[entry["commit"]["id"]] = entry["commit"]
+        data["counter"] = max(data["counter"], entry.get("counter", 0))
+    elif op == "add_branch":
+        # Nhánh (tạo lại) luôn nằm cuối danh sách, như trong bộ nhớ
+        if entry["name"] in data["branches"]: data["branches"].remove(entry["name"])
+        data["branches"].append(entry["name"])
+    elif op == "delete_branch":
+        if entry["name"] in data["branches"]: data["branches"].remove(entry["name"])
+    elif op == "add_parent":
+        c_data = commits.get(entry["child"])
+        if c_data and entry["parent"] not in c_data["parent_ids"]: c_data["parent_ids"].append(entry["parent"])
+    elif op == "update_note":
+        c_data = commits.get(entry["id"])
+        if c_data: c_data.update(note_ref=entry["note_ref"], note_preview=entry["note_preview"])
+    elif op == "update_commit":
+        if entry["id"] in commits: commits[entry["id"]].update(entry["fields"])
+    elif op == "delete_commit":
+        commits.pop(entry["id"], None)
+    elif op == "set_branch":
+        data["current_branch"] = entry["name"]
+
+class JsonStorage:
+    """Lưu trữ mặc định: data.json (snapshot) + journal.jsonl (các thao tác sau snapshot)."""
+    COMPACT_EVERY = 500
+
+    def __init__(self, project_dir):
+        self.json_path = os.path.join(project_dir, 'data.json')
+        self.journal = OperationJournal(os.path.join(project_dir, 'journal.jsonl'))
+
+    def exists(self):
+        return os.path.exists(self.json_path)
+
+    def load(self):
+        if not self.exists(): return None
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data["commits"] = OrderedDict((c["id"], c) for c in data["commits"])
+        data.setdefault("branches", [])
+        snapshot_seq = data.setdefault("seq", 0)
+        self.journal.count = 0
+        for entry in self.journal.read():
+            if entry.get("seq", 0) <= snapshot_seq: continue
+            replay_op(data, entry)
+            data["seq"] = entry["seq"]
+            self.journal.count += 1
+        return data
+
+    def record(self, entries):
+        self.journal.append(entries)
+
+    def needs_compaction(self):
+        return self.journal.count >= self.COMPACT_EVERY
+
+    def stamp(self):
+        return file_stamp(self.json_path, self.journal.path)
+
+    @property
+    def pending(self):
+        # Số thao tác nằm trong journal chưa gộp vào snapshot
+        return self.journal.count
+
+    @pending.setter
+    def pending(self, count):
+        self.journal.count = count
+
+    def save_all(self, data):
+        tmp = self.json_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, self.json_path)
+        self.journal.reset()
+
+    def close(self):
+        pass
+
+class SqliteStorage:
+    """
+    Backend SQLite (tùy chọn): commit, cạnh cha-con, nhánh và ghi chú nằm trong các bảng có index
+    theo id / branch / source_id. Mỗi thao tác chỉ là vài câu lệnh trong một transaction,
+    không phải ghi lại dữ liệu không liên quan.
+    """
+    FILE_NAME = 'data.sqlite'
+    pending = 0
+    COMMIT_FIELDS = ("message", "branch_name", "is_tag", "x", "y", "note_ref", "note_preview", "has_folder", "source_id")
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS commits (
+            id TEXT PRIMARY KEY, ord INTEGER NOT NULL, message TEXT, branch_name TEXT, is_tag TEXT,
+            x NUMERIC, y NUMERIC, note_ref TEXT, note_preview TEXT, has_folder INTEGER, source_id TEXT);
+        CREATE INDEX IF NOT EXISTS idx_commits_ord ON commits(ord);
+        CREATE INDEX IF NOT EXISTS idx_commits_branch ON commits(branch_name);
+        CREATE INDEX IF NOT EXISTS idx_commits_source ON commits(source_id);
+        CREATE TABLE IF NOT EXISTS parents (
+            child TEXT NOT NULL, parent TEXT NOT NULL, pos INTEGER NOT NULL, PRIMARY KEY (child, parent));
+        CREATE INDEX IF NOT EXISTS idx_parents_parent ON parents(parent);
+        CREATE TABLE IF NOT EXISTS branches (name TEXT PRIMARY KEY, pos INTEGER NOT NULL);
+    """
+
+    def __init__(self, project_dir):
+        self.db_path = os.path.join(project_dir, self.FILE_NAME)
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            # NoteWriter ghi từ thread nền; engine đã khóa _io_lock quanh mọi lần ghi
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def exists(self):
+        return os.path.exists(self.db_path)
+
+    def load(self):
+        if not self.exists(): return None
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if "counter" not in meta: return None
+        parent_ids = {}
+        for child, parent in self.conn.execute("SELECT child, parent FROM parents ORDER BY child, pos"):
+            parent_ids.setdefault(child, []).append(parent)
+        commits = OrderedDict()
+        columns = ", ".join(self.COMMIT_FIELDS)
+        for row in self.conn.execute(f"SELECT id, {columns} FROM commits ORDER BY ord"):
+            c_data = dict(zip(("id",) + self.COMMIT_FIELDS, row))
+            c_data["has_folder"] = bool(c_data["has_folder"])
+            c_data["note_preview"] = c_data["note_preview"] or ""
+            c_data["parent_ids"] = parent_ids.get(c_data["id"], [])
+            commits[c_data["id"]] = c_data
+        return {
+            "counter": int(meta["counter"]), "current_branch": meta.get("current_branch", "master"),
+            "seq": int(meta.get("seq", 0)), "commits": commits,
+            "branches": [name for (name,) in self.conn.execute("SELECT name FROM branches ORDER BY pos")]
+        }
+
+    def record(self, entries):
+        with self.conn:
+            for entry in entries: self._apply(entry)
+            self._set_meta(seq=entries[-1]["seq"])
+
+    def _set_meta(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(k, str(v)) for k, v in values.items()])
+
+    def _insert_commit(self, c_data):
+        columns = ", ".join(self.COMMIT_FIELDS)
+        updates = ", ".join(f"{f}=excluded.{f}" for f in self.COMMIT_FIELDS)
+        self.conn.execute(
+            f"INSERT INTO commits (id, ord, {columns}) "
+            f"VALUES (?, (SELECT COALESCE(MAX(ord), 0) + 1 FROM commits), {', '.join('?' * len(self.COMMIT_FIELDS))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}",
+            [c_data["id"]] + [c_data.get(f) for f in self.COMMIT_FIELDS])
+        self.conn.execute("DELETE FROM parents WHERE child = ?", (c_data["id"],))
+        self.conn.executemany("INSERT INTO parents (child, parent, pos) VALUES (?, ?, ?)",
+                              [(c_data["id"], pid, pos) for pos, pid in enumerate(c_data["parent_ids"])])
+
+    def _apply(self, entry):
+        op = entry["op"]
+        if op == "add_commit":
+            self._insert_commit(entry["commit"])
+            self._set_meta(counter=entry.get("counter", 0))
+        elif op == "add_branch":
+            self.conn.execute("INSERT OR REPLACE INTO branches (name, pos) "
+                              "VALUES (?, (SELECT COALESCE(MAX(pos), 0) + 1 FROM branches))", (entry["name"],))
+        elif op == "delete_branch":
+            self.conn.execute("DELETE FROM branches WHERE name = ?", (entry["name"],))
+        elif op == "add_parent":
+            self.conn.execute("INSERT OR IGNORE INTO parents (child, parent, pos) "
+                              "VALUES (?, ?, (SELECT COALESCE(MAX(pos), -1) + 1 FROM parents WHERE child = ?))",
+                              (entry["child"], entry["parent"], entry["child"]))
+        elif op == "update_note":
+            self.conn.execute("UPDATE commits SET note_ref = ?, note_preview = ? WHERE id = ?",
+                              (entry["note_ref"], entry["note_preview"], entry["id"]))
+        elif op == "update_commit":
+            fields = {k: v for k, v in entry["fields"].items() if k in self.COMMIT_FIELDS}
+            if fields:
+                assignments = ", ".join(f"{k} = ?" for k in fields)
+                self.conn.execute(f"UPDATE commits SET {assignments} WHERE id = ?", list(fields.values()) + [entry["id"]])
+        elif op == "delete_commit":
+            self.conn.execute("DELETE FROM commits WHERE id = ?", (entry["id"],))
+            self.conn.execute("DELETE FROM parents WHERE child = ?", (entry["id"],))
+        elif op == "set_branch":
+            self._set_meta(current_branch=entry["name"])
+
+    def needs_compaction(self):
+        return False
+
+    def stamp(self):
+        return file_stamp(self.db_path)
+
+    def save_all(self, data):
+        commits = data["commits"]
+        if isinstance(commits, dict): commits = list(commits.values())
+        with self.conn:
+            for table in ("commits", "parents", "branches", "meta"):
+                self.conn.execute(f"DELETE FROM {table}")
+            for c_data in commits: self._insert_commit(c_data)
+            self.conn.executemany("INSERT INTO branches (name, pos) VALUES (?, ?)",
+                                  [(name, pos) for pos, name in enumerate(data["branches"])])
+            self._set_meta(counter=data["counter"], current_branch=data["current_branch"], seq=data.get("seq", 0))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def migrate_json_to_sqlite(project_dir):
+    """Chuyển một dự án từ data.json (+ journal) sang data.sqlite. File cũ được giữ lại với đuôi .migrated."""
+    source = JsonStorage(project_dir)
+    data = source.load()
+    if data is None: return False
+    target = SqliteStorage(project_dir)
+    target.save_all(data)
+    target.close()
+    os.replace(source.json_path, source.json_path + '.migrated')
+    if os.path.exists(source.journal.path): os.replace(source.journal.path, source.journal.path + '.migrated')
+    return True
+
+def open_storage(project_dir, backend=None):
+    # Dự án đã có data.sqlite thì luôn dùng SQLite; chọn SQLite mà dự án còn ở JSON thì chuyển đổi luôn
+    sqlite_storage = SqliteStorage(project_dir)
+    if sqlite_storage.exists(): return sqlite_storage
+    if (backend or STORAGE_BACKEND) == 'sqlite':
+        migrate_json_to_sqlite(project_dir)
+        return sqlite_storage
+    return JsonStorage(project_dir)
+
+class Commit:
+    # __slots__: không có __dict__ cho từng commit. parents là tuple (tối đa 2 cha - merge, giữ thứ tự,
+    # cha đầu là cha chính); children là tuple rỗng dùng chung -> list -> dict (tập có thứ tự, O(1))
+    # khi số con vượt SMALL_DEGREE, nên commit có hàng nghìn con vẫn thêm/xóa O(1).
+    SMALL_DEGREE = 8
+    __slots__ = ("id", "message", "branch_name", "parents", "children", "x", "y", "is_tag",
+                 "note_ref", "note_preview", "has_folder", "source_id")
+
+    def __init__(self, id, message, branch_name, is_tag=None, note_ref=None, note_preview="", has_folder=False, source_id=None):
+        self.id = id
+        self.message = message
+        self.branch_name = sys.intern(branch_name)
+        self.parents = ()
+        self.children = ()
+        self.x = 0; self.y = 0 
+        self.is_tag = is_tag
+        # Nội dung ghi chú nằm ngoài (Notes/), chỉ giữ tham chiếu + đoạn xem trước
+        self.note_ref = note_ref
+        self.note_preview = note_preview
+        self.has_folder = has_folder
+        self.source_id = source_id if source_id else id 
+
+    def add_parent(self, commit):
+        if commit not in self.parents: self.parents += (commit,)
+    def add_child(self, commit):
+        children = self.children
+        if type(children) is dict: children[commit] = None
+        elif not children: self.children = [commit]
+        elif commit not in children:
+            children.append(commit)
+            if len(children) > self.SMALL_DEGREE: self.children = dict.fromkeys(children)
+    def remove_child(self, commit):
+        children = self.children
+        if type(children) is dict: children.pop(commit, None)
+        elif commit in children: children.remove(commit)
+    def to_dict(self):
+        return {
+            "id": self.id, "message": self.message, "branch_name": self.branch_name,
+            "is_tag": self.is_tag, "parent_ids": [p.id for p in self.parents],
+            "x": self.x, "y": self.y, "note_ref": self.note_ref, "note_preview": self.note_preview,
+            "has_folder": self.has_folder,
+            "source_id": self.source_id 
+        }
+
+class Branch:
+    def __init__(self, name, color_key, head):
+        self.name = name
+        self.color_key = color_key
+        colors = BRANCH_COLORS.get(color_key, BRANCH_COLORS['feature'])
+        self.color = colors['node']
+        self.lane_color = colors['lane']
+        self.line = colors['line']
+        self.head = head
+        self.commits = {head: None}  # Tập có thứ tự, như Commit.parents
+
+class GraphSnapshot:
+    """
+    Bản sao nhị phân gọn của graph (graph.bin) để mở dự án nhanh: chuỗi được intern vào một bảng,
+    thuộc tính commit là các mảng cột, cạnh cha-con dạng CSR (offset + chỉ số cha).
+    Chỉ là cache: dữ liệu gốc vẫn là data.json / data.sqlite, stamp lệch thì bỏ qua và dựng lại.
+    """
+    MAGIC = b'GFG1'
+    FILE_NAME = 'graph.bin'
+    HEADER = struct.Struct('<10q')
+    COLUMNS = ("id", "message", "branch_name", "is_tag", "note_ref", "note_preview", "source_id")
+
+    def __init__(self, project_dir):
+        self.path = os.path.join(project_dir, self.FILE_NAME)
+
+    @staticmethod
+    def _to_bytes(arr):
+        if sys.byteorder != 'little': arr.byteswap()
+        return arr.tobytes()
+
+    def save(self, engine, stamp, pending):
+        strings, index = [], {}
+        def intern(value):
+            if value is None: return -1
+            i = index.get(value)
+            if i is None:
+                i = index[value] = len(strings)
+                strings.append(value)
+            return i
+        commits = list(engine.all_commits.values())
+        position = {c.id: i for i, c in enumerate(commits)}
+        columns = [array.array('i', [intern(getattr(c, name)) for c in commits]) for name in self.COLUMNS]
+        offsets, edges = array.array('i', [0]), array.array('i')
+        for c in commits:
+            edges.extend(position[p.id] for p in c.parents if p.id in position)
+            offsets.append(len(edges))
+        branches = array.array('i', [intern(name) for name in engine.branches])
+        current = intern(engine.current_branch_name)
+        blob = "".join(strings).encode('utf-8')
+        parts = [
+            self.MAGIC,
+            self.HEADER.pack(len(commits), len(edges), len(strings), len(blob), len(branches), len(stamp),
+                             engine.commit_counter, engine._seq, pending, current),
+            self._to_bytes(array.array('q', stamp)),
+            self._to_bytes(array.array('i', [len(x) for x in strings])), blob,
+        ]
+        parts.extend(self._to_bytes(col) for col in columns)
+        parts.append(bytes(1 if c.has_folder else 0 for c in commits))
+        parts.append(self._to_bytes(array.array('q', [int(c.x) for c in commits])))
+        parts.extend((self._to_bytes(offsets), self._to_bytes(edges), self._to_bytes(branches)))
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f: f.write(b"".join(parts))
+        os.replace(tmp, self.path)
+
+    def _read(self, stamp):
+        # Đọc header + bảng chuỗi -> (header, strings, take) với take(typecode, count) đọc tiếp phần sau; None nếu không dùng được
+        try:
+            with open(self.path, 'rb') as f: buf = f.read()
+        except OSError:
+            return None
+        if buf[:4] != self.MAGIC: return None
+        header = self.HEADER.unpack_from(buf, 4)
+        n_strings, blob_len, n_stamp = header[2], header[3], header[5]
+        offset = 4 + self.HEADER.size
+        def take(typecode, count):
+            nonlocal offset
+            arr = array.array(typecode)
+            size = arr.itemsize * count
+            arr.frombytes(buf[offset:offset + size])
+            offset += size
+            if sys.byteorder != 'little': arr.byteswap()
+            return arr
+        if list(take('q', n_stamp)) != list(stamp): return None
+        lengths = take('i', n_strings)
+        text = buf[offset:offset + blob_len].decode('utf-8')
+        offset += blob_len
+        strings, pos = [], 0
+        for length in lengths:
+            strings.append(text[pos:pos + length])
+            pos += length
+        strings.append(None)  # chỉ số -1 -> None
+        return header, strings, take
+
+    def load(self, stamp):
+        """Trả về (counter, current_branch, seq, pending, commits, branches) hoặc None nếu cache không dùng được."""
+        found = self._read(stamp)
+        if found is None: return None
+        (n, n_edges, _, _, n_branches, _, counter, seq, pending, current), strings, take = found
+        columns = [take('i', n) for _ in self.COLUMNS]
+        has_folder = take('B', n)
+        xs = take('q', n)
+        offsets, edges, branches = take('i', n + 1), take('i', n_edges), take('i', n_branches)
+        commits = []
+        for i, (cid, message, branch, tag, note_ref, preview, source_id) in enumerate(zip(*columns)):
+            c = Commit(strings[cid], strings[message], strings[branch], strings[tag], strings[note_ref],
+                       strings[preview] or "", bool(has_folder[i]), strings[source_id])
+            c.x = xs[i]
+            commits.append(c)
+        # Một lượt nối cạnh, không kiểm tra trùng (cạnh trong snapshot đã là duy nhất)
+        for i, child in enumerate(commits):
+            for j in range(offsets[i], offsets[i + 1]):
+                parent = commits[edges[j]]
+                child.parents += (parent,)
+                parent.add_child(child)
+        return (counter, strings[current], seq, pending, {c.id: c for c in commits}, [strings[b] for b in branches])
+
+    def summary(self, stamp):
+        """(số commit, tên các nhánh) mà không dựng commit nào, hoặc None nếu cache không dùng được."""
+        found = self._read(stamp)
+        if found is None: return None
+        (n, n_edges, _, _, n_branches, _, _, _, _, _), strings, take = found
+        take('i', n * len(self.COLUMNS)); take('B', n); take('q', n); take('i', n + 1 + n_edges)  # Bỏ qua các cột commit
+        return n, [strings[b] for b in take('i', n_branches)]
+
+class ContentIndex:
+    """
+    Chỉ mục ngược cho nội dung file (content_index.sqlite): token (định danh / từ, viết thường) ->
+    (blob, dòng). Đánh chỉ mục theo hash blob nên nội dung dùng chung giữa các commit (source_id,
+    file trùng) chỉ được đọc một lần, và chỉ mục không bao giờ lệch so với kho object.
+    """
+    FILE_NAME = 'content_index.sqlite'
+    MAX_FILE_SIZE = 8 * 1024 * 1024   # File lớn hơn / file nhị phân: ghi nhận nhưng không đánh chỉ mục
+    MAX_TOKEN_LEN = 64
+    TOKEN_RE = re.compile(r'\w+')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, lines INTEGER);
+        CREATE TABLE IF NOT EXISTS postings (
+            token TEXT NOT NULL, digest TEXT NOT NULL, line INTEGER NOT NULL,
+            PRIMARY KEY (token, digest, line)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_postings_digest ON postings(digest);
+    """
+
+    def __init__(self, project_dir):
+        self.db_path = os.path.join(project_dir, self.FILE_NAME)
+        self._conn = None
+        self._known = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            # Upload đánh chỉ mục ngay trên thread của FileWorker
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._known = {digest for (digest,) in self._conn.execute("SELECT digest FROM blobs")}
+        return self._conn
+
+    @classmethod
+    def tokenize(cls, text):
+        return [t for t in cls.TOKEN_RE.findall(text.lower()) if len(t) <= cls.MAX_TOKEN_LEN]
+
+    @staticmethod
+    def decode(data):
+        # None nếu là file nhị phân
+        if b'\0' in data[:8192]: return None
+        return data.decode('utf-8', errors='replace')
+
+    def add_blobs(self, blobs, digests):
+        """Đánh chỉ mục các blob chưa có; trả về số blob mới được đọc."""
+        with self._lock:
+            conn = self.conn
+            todo = [d for d in set(digests) if d not in self._known]
+            with conn:
+                for digest in todo:
+                    text = None
+                    if blobs.has(digest) and os.path.getsize(blobs.blob_path(digest)) <= self.MAX_FILE_SIZE:
+                        text = self.decode(blobs.read(digest))
+                    lines = text.splitlines() if text is not None else []
+                    conn.executemany("INSERT OR IGNORE INTO postings (token, digest, line) VALUES (?, ?, ?)",
+                                     ((token, digest, no) for no, line in enumerate(lines, 1)
+                                      for token in set(self.tokenize(line))))
+                    conn.execute("INSERT OR REPLACE INTO blobs (digest, lines) VALUES (?, ?)", (digest, len(lines)))
+            self._known.update(todo)
+            return len(todo)
+
+    def remove_blobs(self, digests):
+        with self._lock:
+            with self.conn:
+                for digest in digests:
+                    self.conn.execute("DELETE FROM postings WHERE digest = ?", (digest,))
+                    self.conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self._known.difference_update(digests)
+
+    def lookup(self, query):
+        """
+        {digest: [số dòng]} có thể chứa câu tìm: mọi token phải xuất hiện trên cùng dòng; token cuối được
+        so như tiền tố (đang gõ dở một định danh). Người gọi kiểm lại nguyên câu trên dòng thật.
+        """
+        tokens = self.tokenize(query)
+        if not tokens: return {}
+        with self._lock:
+            candidates = None
+            for token in dict.fromkeys(tokens):
+                if token == tokens[-1]:
+                    rows = self.conn.execute("SELECT digest, line FROM postings WHERE token >= ? AND token < ?",
+                                             (token, token + '\uffff'))
+                else:
+                    rows = self.conn.execute("SELECT digest, line FROM postings WHERE token = ?", (token,))
+                hits = set(rows)
+                candidates = hits if candidates is None else candidates & hits
+                if not candidates: return {}
+        result = {}
+        for digest, line in sorted(candidates): result.setdefault(digest, []).append(line)
+        return result
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class SearchIndex:
+    """
+    Chỉ mục trigram cho ô lọc: tìm chuỗi con (giống lọc kiểu `in` cũ) bằng cách giao các tập
+    commit chứa từng trigram của câu tìm, rồi mới kiểm tra lại trên ít ứng viên còn lại.
+    """
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+        self.version = 0
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def set(self, key, text):
+        text = text.lower()
+        if self.docs.get(key) == text: return
+        self.remove(key)
+        self.docs[key] = text
+        for gram in self._trigrams(text): self.postings.setdefault(gram, set()).add(key)
+        self.version += 1
+
+    def remove(self, key):
+        text = self.docs.pop(key, None)
+        if text is None: return
+        for gram in self._trigrams(text):
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys: del self.postings[gram]
+        self.version += 1
+
+    def search(self, query):
+        query = query.lower()
+        if len(query) < 3:
+            candidates = self.docs.keys()
+        else:
+            # Giao từ tập nhỏ nhất trước
+            sets = sorted((self.postings.get(gram, set()) for gram in self._trigrams(query)), key=len)
+            candidates = set.intersection(*sets) if sets[0] else set()
+        return frozenset(key for key in candidates if query in self.docs[key])
+
+class SpatialIndex:
+    """
+    Lưới ô chữ nhật cho canvas: mỗi phần tử (node, cạnh, lane) là một hộp bao (x0, y0, x1, y1),
+    chỉ tra các ô giao với vùng cần vẽ. Hộp trải quá MAX_CELLS ô: cao mà hẹp -> xếp theo cột,
+    rộng mà thấp (cạnh nhảy xa trên cùng lane, lane) -> theo hàng, còn lại để trong một tập riêng.
+    """
+    MAX_CELLS = 16
+
+    def __init__(self, cell_w, cell_h):
+        self.cell_w, self.cell_h = cell_w, cell_h
+        self.boxes = {}
+        self._where = {}  # khóa -> (bảng, các ô chứa nó)
+        self._grid, self._cols, self._rows, self._wide = {}, {}, {}, set()
+
+    @staticmethod
+    def _cells(lo, hi, size):
+        return range(int(lo // size), int(hi // size) + 1) if hi < math.inf else None
+
+    def set(self, key, box):
+        old = self.boxes.get(key)
+        if old == box: return
+        if old is not None: self.remove(key)
+        self.boxes[key] = box
+        x0, y0, x1, y1 = box
+        if x0 == x1 and y0 == y1:
+            # Node: đúng một ô (đường nhanh khi dựng index cho cả dự án)
+            cell = (int(x0 // self.cell_w), int(y0 // self.cell_h))
+            self._grid.setdefault(cell, set()).add(key)
+            self._where[key] = (self._grid, (cell,))
+            return
+        cols, rows = self._cells(x0, x1, self.cell_w), self._cells(y0, y1, self.cell_h)
+        if cols is not None and rows is not None and len(cols) * len(rows) <= self.MAX_CELLS:
+            table, cells = self._grid, [(i, j) for i in cols for j in rows]
+        elif cols is not None and len(cols) <= self.MAX_CELLS: table, cells = self._cols, cols
+        elif rows is not None and len(rows) <= self.MAX_CELLS: table, cells = self._rows, rows
+        else:
+            self._wide.add(key)
+            self._where[key] = (None, ())
+            return
+        for cell in cells: table.setdefault(cell, set()).add(key)
+        self._where[key] = (table, cells)
+
+    def remove(self, key):
+        if self.boxes.pop(key, None) is None: return
+        table, cells = self._where.pop(key)
+        if table is None:
+            self._wide.discard(key)
+            return
+        for cell in cells:
+            keys = table[cell]
+            keys.discard(key)
+            if not keys: del table[cell]
+
+    def query(self, x0, y0, x1, y1):
+        cols, rows = self._cells(x0, x1, self.cell_w), self._cells(y0, y1, self.cell_h)
+        found = set(self._wide)
+        # Vùng hỏi lớn hơn số ô đang có dữ liệu (vd. vẽ cả canvas) -> duyệt các ô có dữ liệu
+        if len(cols) * len(rows) <= len(self._grid):
+            for i in cols:
+                for j in rows: found.update(self._grid.get((i, j), ()))
+        else:
+            for (i, j), keys in self._grid.items():
+                if i in cols and j in rows: found.update(keys)
+        for table, span in ((self._cols, cols), (self._rows, rows)):
+            if len(span) <= len(table):
+                for cell in span: found.update(table.get(cell, ()))
+            else:
+                for cell, keys in table.items():
+                    if cell in span: found.update(keys)
+        boxes = self.boxes
+        return [key for key in found
+                if boxes[key][0] <= x1 and boxes[key][2] >= x0 and boxes[key][1] <= y1 and boxes[key][3] >= y0]
+
+class ProjectEngine:
+    def __init__(self, project_name="Project_Default", data_root=None, backend=None):
+        # data_root / backend mặc định: default_data_root() và STORAGE_BACKEND (dùng khi chạy không giao diện)
+        self.project_name = project_name
+        self.branches = OrderedDict() 
+        self.all_commits = {}
+        self.commit_counter = 0
+        self.branch_line_offset = {}
+        self.commit_x_map = {} 
+        self._dirty_commits = set()
+        self.generation = {}
+        self._fp_depth = {}   # Độ sâu theo chuỗi cha chính
+        self._jump = {}       # Con trỏ nhảy (skew-binary) trên chuỗi cha chính
+        self._merge_below = {}  # Commit merge gần nhất (tính cả chính nó) trên chuỗi cha chính
+        self._lineage_cache = OrderedDict()
+        self._search = None         # SearchIndex, dựng ở lần tìm đầu tiên
+        self._search_result = None  # (câu tìm, version của index, kết quả)
+        self._note_texts = {}       # Chữ thuần đầy đủ của ghi chú dài (đọc nền / vừa sửa); còn lại tìm theo note_preview
+        self.note_texts_loaded = False
+        self._spatial = None        # SpatialIndex cho canvas, dựng ở lần vẽ đầu tiên
+        self._spatial_pending = set()        # Commit đổi vị trí / cạnh, cập nhật vào index ở lần tra sau
+        self._spatial_pending_lanes = set()  # Lane đổi vị trí y
+        self.render_version = 0  # Tăng mỗi khi thứ vẽ trên canvas đổi (canvas bỏ cache tile)
+        self.x_step = 100; self.y_step = 70; self.base_start_x = 60
+        self.current_max_x = self.base_start_x; self.current_max_y = 300 
+        self.current_branch_name = 'master'
+        self.canvas = None 
+        self.project_dir = os.path.join(data_root or default_data_root(), project_name)
+        self.files_dir = os.path.join(self.project_dir, 'Commit_Files')
+        self.manifests_dir = os.path.join(self.project_dir, 'Manifests')
+        self.notes_dir = os.path.join(self.project_dir, 'Notes')
+        self.assets_dir = os.path.join(self.project_dir, 'Assets')
+        self._setup_directories()
+        self.blobs = BlobStore(os.path.join(self.project_dir, 'Objects'))
+        self.content_index = ContentIndex(self.project_dir)
+        self._manifests = {}
+        self._note_cache = OrderedDict()
+        self.storage = open_storage(self.project_dir, backend)
+        self.graph_cache = GraphSnapshot(self.project_dir)
+        self._graph_stamp = None
+        self._seq = 0
+        self._batch = None  # Thao tác đang gom trong batch(), ghi một lần khi kết thúc
+        self._batch_snapshot = False
+        self._io_lock = threading.RLock()
+        if not self.load_data(): self._initialize_git_history_clean()
+
+    def _setup_directories(self):
+        if not os.path.exists(self.project_dir): os.makedirs(self.project_dir)
+        if not os.path.exists(self.files_dir): os.makedirs(self.files_dir)
+        if not os.path.exists(self.manifests_dir): os.makedirs(self.manifests_dir)
+        if not os.path.exists(self.notes_dir): os.makedirs(self.notes_dir)
+        os.makedirs(os.path.join(self.assets_dir, 'thumbs'), exist_ok=True)
+
+    def _get_new_commit_id(self):
+        self.commit_counter += 1
+        return f"{self.project_name[0]}-{self.commit_counter}"
+
+    def get_commit_folder_path(self, commit_id):
+        # Thư mục làm việc (workspace) - chỉ được dựng ra khi cần mở bằng VS Code/Explorer
+        return os.path.join(self.files_dir, commit_id)
+
+    def resolve_storage_path(self, commit_id):
+        if commit_id not in self.all_commits: return None
+        return self.get_commit_folder_path(self.all_commits[commit_id].source_id)
+
+    def link_commit_files(self, src_commit_id, dst_commit_id):
+        # Commit con chỉ trỏ tới manifest của nguồn, không copy gì cả
+        if src_commit_id not in self.all_commits or dst_commit_id not in self.all_commits: return
+        src = self.all_commits[src_commit_id]
+        dst = self.all_commits[dst_commit_id]
+        self.update_commit(dst_commit_id, source_id=src.source_id, has_folder=dst.has_folder or src.has_folder)
+
+    # --- Manifest: {đường dẫn tương đối: [hash, size, mtime_ns, mode]} ---
+    # Trên đĩa: {"version": 2, "count", "bytes", "files": [[path, hash, size, mtime_ns, mode], ...]}
+    # sắp theo path. Mọi thao tác xem cây file / diff / thống kê / backup đều chạy từ đây,
+    # không cần duyệt thư mục.
+
+    MANIFEST_VERSION = 2
+    DEFAULT_FILE_MODE = 0o644
+
+    def get_manifest(self, commit_id):
+        commit = self.all_commits.get(commit_id)
+        if not commit or not commit.has_folder: return {}
+        return self._load_manifest(commit.source_id)
+
+    def get_snapshot_stats(self, commit_id):
+        # (số file, tổng dung lượng) của snapshot, đọc từ manifest
+        files = self.get_manifest(commit_id)
+        return len(files), sum(entry[1] for entry in files.values())
+
+    def _manifest_path(self, source_id):
+        return os.path.join(self.manifests_dir, f"{source_id}.json")
+
+    def _load_manifest(self, source_id, cache=True):
+        # cache=False: đọc một lần rồi bỏ (xuất cả dự án không giữ mọi manifest trong RAM)
+        if source_id in self._manifests: return self._manifests[source_id]
+        path = self._manifest_path(source_id)
+        files = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                files = {row[0]: row[1:] for row in json.load(f)["files"]}
+        else:
+            # Dự án cũ: file nằm nguyên trong Commit_Files -> nạp vào kho object,
+            # folder cũ được giữ lại làm workspace
+            legacy_dir = self.get_commit_folder_path(source_id)
+            if os.path.isdir(legacy_dir):
+                files = self.build_snapshot(legacy_dir)
+                self._write_manifest(source_id, files)
+        if cache: self._manifests[source_id] = files
+        return files
+
+    def _write_manifest(self, source_id, files):
+        path = self._manifest_path(source_id)
+        tmp = path + '.tmp'
+        data = {
+            "version": self.MANIFEST_VERSION, "count": len(files),
+            "bytes": sum(entry[1] for entry in files.values()),
+            "files": [[rel] + files[rel] for rel in sorted(files)]
+        }
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, path)
+        self._manifests[source_id] = files
+        self.index_snapshot(files)
+
+    def index_snapshot(self, files):
+        # Đánh chỉ mục nội dung cho blob mới; blob đã có trong chỉ mục bị bỏ qua ngay
+        return self.content_index.add_blobs(self.blobs, (entry[0] for entry in files.values()))
+
+    def build_snapshot(self, src, progress=None, previous=None, verify_hash=False, report=None):
+        """
+        Nạp toàn bộ file trong src vào kho object và trả về manifest.
+        Nếu có manifest cũ (previous), file nào trùng size + mtime thì dùng lại hash, không đọc lại
+        (verify_hash=True thì vẫn hash lại để so nội dung). Chỉ nội dung chưa có trong kho mới bị ghi.
+        """
+        previous = previous or {}
+        report = report if report is not None else SyncReport()
+        files = {}
+        if not os.path.isdir(src): return files
+
+        def ingest(item):
+            full_path, rel, st = item
+            mode = stat.S_IMODE(st.st_mode)
+            old = previous.get(rel)
+            if old and old[1] == st.st_size and not verify_hash:
+                if old[2] == st.st_mtime_ns:
+                    return rel, old if old[3] == mode else old[:3] + [mode], False
+            digest = self.blobs.hash_file(full_path)
+            copied = not self.blobs.has(digest)
+            if copied: self.blobs.put_file(full_path, digest)
+            return rel, [digest, st.st_size, st.st_mtime_ns, mode], copied
+
+        def collect(result):
+            rel, entry, copied = result
+            files[rel] = entry
+            if copied: report.copy(entry[1])
+            else: report.skip(entry[1])
+
+        TransferEngine(progress).run(scan_tree(src), ingest, collect, label=lambda r: r[0])
+        report.removed_files = sum(1 for rel in previous if rel not in files)
+        return files
+
+    def set_snapshot(self, commit_id, files):
+        self._write_manifest(commit_id, files)
+        self.update_commit(commit_id, source_id=commit_id, has_folder=True)
+        # Workspace đang mở thì cập nhật theo (chỉ ghi file đổi, xóa file đã bỏ)
+        if os.path.isdir(self.get_commit_folder_path(commit_id)):
+            self.materialize_workspace(commit_id)
+
+    def fork_snapshot(self, commit_id):
+        # Commit đang dùng chung file với nguồn -> tách manifest riêng (chỉ copy danh sách, không copy file)
+        commit = self.all_commits[commit_id]
+        if commit.source_id == commit.id: return
+        self._write_manifest(commit.id, dict(self.get_manifest(commit_id)))
+        self.update_commit(commit_id, source_id=commit.id)
+
+    def materialize_workspace(self, commit_id, progress=None, report=None):
+        # Dựng thư mục làm việc từ manifest; file đã đúng size + mtime thì giữ nguyên
+        report = report if report is not None else SyncReport()
+        commit = self.all_commits[commit_id]
+        files = self.get_manifest(commit_id)
+        dst = self.get_commit_folder_path(commit.source_id)
+        os.makedirs(dst, exist_ok=True)
+
+        def place(item):
+            rel, entry = item
+            target = os.path.join(dst, *rel.split('/'))
+            if os.path.exists(target):
+                st = os.stat(target)
+                if st.st_size == entry[1] and st.st_mtime_ns == entry[2]:
+                    return rel, entry[1], None
+                os.remove(target)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            mode = self.blobs.materialize(entry[0], target)
+            os.chmod(target, entry[3])
+            os.utime(target, ns=(entry[2], entry[2]))
+            return rel, entry[1], mode
+
+        def collect(result):
+            rel, size, mode = result
+            if mode is None: report.skip(size)
+            elif mode == 'copy': report.copy(size)
+            else: report.link(size)
+
+        TransferEngine(progress).run(list(files.items()), place, collect, label=lambda r: r[0])
+        for full_path, rel, st in list(scan_tree(dst)):
+            if rel not in files:
+                os.remove(full_path)
+                report.removed_files += 1
+        return dst
+
+    def sync_workspace(self, commit_id):
+        # Ghi nhận thay đổi người dùng sửa trực tiếp trong workspace (VS Code, Explorer)
+        commit = self.all_commits.get(commit_id)
+        if not commit or not commit.has_folder: return False
+        workspace = self.get_commit_folder_path(commit.source_id)
+        if not os.path.isdir(workspace): return False
+        previous = self._load_manifest(commit.source_id)
+        files = self.build_snapshot(workspace, previous=previous)
+        if files == previous: return False
+        self._write_manifest(commit.source_id, files)
+        return True
+
+    def sync_all_workspaces(self):
+        # Trả về id các commit có snapshot vừa đổi theo workspace
+        return [name for name in os.listdir(self.files_dir) if name in self.all_commits and self.sync_workspace(name)]
+
+    def backup_files(self):
+        """
+        Danh sách (đường dẫn tuyệt đối, đường dẫn trong backup) của dự án, lấy theo manifest:
+        bỏ qua workspace (dựng lại được từ kho object) và chỉ lấy những blob còn được tham chiếu.
+        """
+        self.sync_all_workspaces()
+        digests = set()
+        for commit in self.all_commits.values():
+            if commit.has_folder:
+                digests.update(entry[0] for entry in self._load_manifest(commit.source_id).values())
+        entries = []
+        for entry in os.scandir(self.project_dir):
+            if entry.name in ('Objects', 'Commit_Files', GraphSnapshot.FILE_NAME, ContentIndex.FILE_NAME): continue
+            if entry.is_dir():
+                entries.extend((full_path, f"{entry.name}/{rel}") for full_path, rel, st in scan_tree(entry.path)
+                               if not (entry.name == 'Assets' and rel.startswith('thumbs/')))
+            else:
+                entries.append((entry.path, entry.name))
+        for digest in sorted(digests):
+            entries.append((self.blobs.blob_path(digest), f"Objects/{digest[:2]}/{digest[2:]}"))
+        return entries
+
+    def read_file(self, commit_id, rel_path):
+        entry = self.get_manifest(commit_id).get(rel_path)
+        if not entry: raise FileNotFoundError(rel_path)
+        return self.blobs.read(entry[0])
+
+    def write_file(self, commit_id, rel_path, data):
+        self.fork_snapshot(commit_id)
+        commit = self.all_commits[commit_id]
+        files = dict(self._load_manifest(commit.id))
+        digest = self.blobs.put_bytes(data)
+        mtime_ns = time.time_ns()
+        old = files.get(rel_path)
+        mode = old[3] if old else self.DEFAULT_FILE_MODE
+        workspace = self.get_commit_folder_path(commit.id)
+        if os.path.isdir(workspace):
+            target = os.path.join(workspace, *rel_path.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # File cũ có thể read-only (mode lấy theo manifest) -> xóa rồi ghi mới
+            if os.path.exists(target): os.remove(target)
+            with open(target, 'wb') as f: f.write(data)
+            os.chmod(target, mode)
+            os.utime(target, ns=(mtime_ns, mtime_ns))
+        files[rel_path] = [digest, len(data), mtime_ns, mode]
+        self._write_manifest(commit.id, files)
+
+    def drop_snapshot(self, source_id):
+        path = self._manifest_path(source_id)
+        if os.path.exists(path): os.remove(path)
+        self._manifests.pop(source_id, None)
+        workspace = self.get_commit_folder_path(source_id)
+        if os.path.exists(workspace): remove_tree(workspace)
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        # Xóa blob không còn manifest nào tham chiếu
+        referenced = set()
+        for name in os.listdir(self.manifests_dir):
+            if not name.endswith('.json'): continue
+            source_id = name[:-len('.json')]
+            referenced.update(entry[0] for entry in self._load_manifest(source_id).values())
+        removed = [digest for digest in self.blobs.iter_digests() if digest not in referenced]
+        for digest in removed: self.blobs.remove(digest)
+        if removed: self.content_index.remove_blobs(removed)
+
+    def search_content(self, query, limit=500):
+        """
+        Tìm chuỗi trong nội dung file của mọi snapshot qua chỉ mục ngược.
+        Trả về [(commit id, đường dẫn, số dòng, nội dung dòng)] theo thứ tự commit.
+        """
+        snapshots = OrderedDict()
+        for commit in self.all_commits.values():
+            if commit.has_folder: snapshots.setdefault(commit.source_id, []).append(commit.id)
+        manifests = {source_id: self._load_manifest(source_id) for source_id in snapshots}
+        # Dự án cũ / blob nạp trước khi có chỉ mục: bổ sung một lần
+        for files in manifests.values(): self.index_snapshot(files)
+        hits = self.content_index.lookup(query)
+        needle = query.lower().strip()
+        lines = {}
+        for digest, numbers in hits.items():
+            text = ContentIndex.decode(self.blobs.read(digest)).splitlines()
+            matched = [(no, text[no - 1].strip()) for no in numbers if needle in text[no - 1].lower()]
+            if matched: lines[digest] = matched
+        results = []
+        for source_id, commit_ids in snapshots.items():
+            for rel, entry in sorted(manifests[source_id].items()):
+                for no, line in lines.get(entry[0], ()):
+                    results.extend((commit_id, rel, no, line) for commit_id in commit_ids)
+                    if len(results) >= limit: return results[:limit]
+        return results
+
+    # --- Lưu trữ: mọi thay đổi đi qua _record (một thao tác), save_data ghi lại toàn bộ ---
+
+    def _record(self, op, compact=True, **data):
+        # compact=False: gọi từ thread nền, không được chạy compaction (đọc toàn bộ graph)
+        with self._io_lock:
+            self._seq += 1
+            data["op"] = op
+            data["seq"] = self._seq
+            if self._batch is not None:
+                if not self._batch_snapshot: self._batch.append(data)
+                return
+            self.storage.record([data])
+        if compact and self.storage.needs_compaction(): self.save_data()
+
+    @contextmanager
+    def batch(self, snapshot=False):
+        """
+        Gom mọi thao tác bên trong thành một lần ghi (một lần append journal / một transaction SQLite).
+        snapshot=True (nhập số lượng lớn): không giữ lại từng thao tác trong RAM, kết thúc thì ghi lại
+        toàn bộ dữ liệu đúng một lần (save_data giữa chừng cũng được dời tới lúc đó).
+        Lỗi giữa chừng thì các thao tác đã làm vẫn được ghi, để dữ liệu khớp với bộ nhớ.
+        """
+        if self._batch is not None:
+            # Batch lồng nhau: chỉ có thể chuyển batch ngoài cùng sang kiểu snapshot
+            if snapshot: self._batch_snapshot = True
+            yield self
+            return
+        self._batch, self._batch_snapshot = [], snapshot
+        try:
+            yield self
+        finally:
+            with self._io_lock:
+                entries, self._batch = self._batch, None
+                if self._batch_snapshot: self.save_data()
+                elif entries: self.storage.record(entries)
+                self._batch_snapshot = False
+            if self.storage.needs_compaction(): self.save_data()
+
+    def save_data(self):
+        if self._batch is not None and self._batch_snapshot: return
+        with self._io_lock:
+            self.storage.save_all({
+                "counter": self.commit_counter, "current_branch": self.current_branch_name,
+                "seq": self._seq,
+                "commits": [c.to_dict() for c in self.all_commits.values()],
+                "branches": list(self.branches.keys())
+            })
+            self.save_graph_cache()
+
+    def save_graph_cache(self):
+        with self._io_lock:
+            stamp = self.storage.stamp()
+            if stamp == self._graph_stamp: return
+            try:
+                self.graph_cache.save(self, stamp, self.storage.pending)
+                self._graph_stamp = stamp
+            except OSError:
+                pass  # Cache hỏng/không ghi được thì lần sau đọc từ dữ liệu gốc
+
+    def load_data(self):
+        try:
+            stamp = self.storage.stamp()
+            graph = self.graph_cache.load(stamp)
+            if graph:
+                counter, current_branch, self._seq, self.storage.pending, commits, branch_names = graph
+                self._attach_graph(counter, current_branch, commits, branch_names)
+                self._graph_stamp = stamp
+                return True
+            data = self.storage.load()
+            if data is None: return False
+            self._seq = data["seq"]
+            legacy_notes = self._build_graph(data)
+            if legacy_notes or self.storage.needs_compaction(): self.save_data()
+            else: self.save_graph_cache()
+            return True
+        except Exception: return False
+
+    def migrate_storage(self, backend):
+        # Đổi kiểu lưu trữ của dự án đang mở (hiện hỗ trợ JSON -> SQLite)
+        if backend != 'sqlite' or isinstance(self.storage, SqliteStorage): return False
+        with self._io_lock:
+            self.save_data()
+            self.storage.close()
+            migrate_json_to_sqlite(self.project_dir)
+            self.storage = SqliteStorage(self.project_dir)
+        return True
+
+    def summary(self):
+        # Thông tin hiện ở header dự án khi chưa nạp engine (xem ProjectIndex)
+        return project_summary(len(self.all_commits), list(self.branches.keys()), self.storage.stamp())
+
+    def close(self):
+        # Ghi lại graph.bin nếu đã lệch so với dữ liệu gốc -> lần mở sau không phải đọc lại data.json
+        with self._io_lock:
+            self.storage.close()
+            self.content_index.close()
+            self.save_graph_cache()
+
+    def _build_graph(self, data):
+        commits = list(data["commits"].values())
+        legacy_notes = False
+        all_commits = {}
+        for c_data in commits:
+            c = Commit(c_data["id"], c_data["message"], c_data["branch_name"], 
+                       c_data["is_tag"], c_data.get("note_ref"), c_data.get("note_preview", ""),
+                       c_data.get("has_folder", False),
+                       c_data.get("source_id", None)) 
+            c.x, c.y = c_data["x"], c_data["y"]
+            if c_data.get("note"):
+                # Dữ liệu cũ: ghi chú nằm trong data.json -> tách ra Notes/
+                c.note_ref, c.note_preview = self._write_note(c.id, c_data["note"])
+                legacy_notes = True
+            all_commits[c.id] = c
+        for c_data in commits:
+            child = all_commits[c_data["id"]]
+            for pid in c_data["parent_ids"]:
+                parent = all_commits.get(pid)
+                if parent is not None:
+                    child.parents += (parent,)
+                    parent.add_child(child)
+        self._attach_graph(data["counter"], data["current_branch"], all_commits, data["branches"])
+        return legacy_notes
+
+    def _attach_graph(self, counter, current_branch, all_commits, branch_names):
+        # all_commits: id -> Commit (theo thứ tự tạo) đã nối sẵn cha/con
+        self.commit_counter = counter
+        self.current_branch_name = current_branch
+        self.all_commits = all_commits
+        self._search = self._search_result = None
+        self._note_texts, self.note_texts_loaded = {}, False
+        self.commit_x_map = {cid: c.x for cid, c in all_commits.items()}
+        self._rebuild_generations()
+        self.branches = OrderedDict()
+        commits_by_branch = {}
+        for c in self.all_commits.values():
+            commits_by_branch.setdefault(c.branch_name, []).append(c)
+        for b_name in branch_names:
+            if b_name in commits_by_branch:
+                branch_commits = commits_by_branch[b_name]
+                head = max(branch_commits, key=lambda x: x.x)
+                br = Branch(b_name, branch_color_key(b_name), head)
+                br.commits = dict.fromkeys(branch_commits)
+                self.branches[b_name] = br
+        self.branch_line_offset = {}
+        self.calculate_commit_positions(full=True)
+
+    def _initialize_git_history_clean(self):
+        c1 = Commit(f"{self.project_name[0]}-1", "Init", "master", is_tag=" ")
+        c1.source_id = c1.id 
+        self.all_commits[c1.id] = c1
+        self.commit_counter = 1
+        self.branches["master"] = Branch("master", 'master', c1)
+        self.current_branch_name = 'master'
+        self.commit_x_map[c1.id] = self.base_start_x
+        self._index_commit(c1)
+        self.current_max_x = self.base_start_x
+        self.calculate_commit_positions(full=True)
+        self.save_data()
+
+    def drop_seed_commit(self):
+        """Dự án chỉ còn commit "Init" tự tạo lúc khởi tạo -> bỏ nó (lịch sử nhập từ git có root riêng). True nếu đã bỏ."""
+        if len(self.all_commits) != 1: return False
+        seed = next(iter(self.all_commits.values()))
+        if (seed.id != f"{self.project_name[0]}-1" or seed.message != "Init" or seed.branch_name != "master"
+                or seed.has_folder or seed.note_ref): return False
+        self.delete_commit(seed.id)
+        self.commit_counter = 0
+        return True
+
+    def _recalculate_branch_offsets(self):
+        # Trả về tên các lane bị đổi vị trí y (thêm nhánh mới có thể đẩy các lane phía sau xuống)
+        current_y = 60
+        order = ['master', 'hotfix', 'release', 'develop']
+        def sort_key(name): return order.index(name) if name in order else 99
+        changed = []
+        for name in sorted(self.branches.keys(), key=sort_key):
+            if self.branch_line_offset.get(name) != current_y:
+                self.branch_line_offset[name] = current_y
+                changed.append(name)
+            current_y += self.y_step
+        self.current_max_y = current_y + 50
+        return changed
+
+    def calculate_commit_positions(self, full=False):
+        """
+        Cập nhật tọa độ theo kiểu tăng dần: chỉ các commit đã đánh dấu (_dirty_commits) và
+        commit thuộc lane bị dời. full=True (nạp graph) thì duyệt lại toàn bộ.
+        """
+        changed_lanes = self._recalculate_branch_offsets()
+        self.render_version += 1
+        if full:
+            self._dirty_commits.clear()
+            self._spatial = None
+            self._spatial_pending.clear()
+            self._spatial_pending_lanes.clear()
+            max_x_found = self.base_start_x
+            for commit in self.all_commits.values():
+                commit.y = self.branch_line_offset.get(commit.branch_name, 0)
+                commit.x = self.commit_x_map.get(commit.id, 0)
+                if commit.x > max_x_found: max_x_found = commit.x
+            self.current_max_x = max_x_found
+        else:
+            for name in changed_lanes:
+                y = self.branch_line_offset[name]
+                for commit in self.branches[name].commits: commit.y = y
+                if self._spatial is not None: self._spatial_pending.update(self.branches[name].commits)
+            self._spatial_pending_lanes.update(changed_lanes)
+            if self._spatial is not None: self._spatial_pending.update(self._dirty_commits)
+            for commit in self._dirty_commits:
+                commit.y = self.branch_line_offset.get(commit.branch_name, 0)
+                commit.x = self.commit_x_map.get(commit.id, 0)
+                if commit.x > self.current_max_x: self.current_max_x = commit.x
+            self._dirty_commits.clear()
+        if self.canvas: self.canvas.update_size(self.current_max_x + 400, self.current_max_y)
+
+    def relayout(self):
+        """
+        Sắp xếp lại trục x: duyệt commit theo thứ tự topo (hòa thì theo x cũ), đặt mỗi commit vào cột
+        nhỏ nhất nằm sau mọi commit cha và sau commit liền trước trên cùng lane. Cột trống do xóa node
+        được thu lại, các lane song song dùng chung cột; lane (trục y) giữ nguyên. Chạy lại trên graph
+        không đổi cho cùng kết quả. Trả về (chiều rộng cũ, chiều rộng mới).
+        """
+        old_width = self.current_max_x
+        order = sorted(self.all_commits.values(), key=lambda c: self.commit_x_map.get(c.id, 0))
+        rank = {c: i for i, c in enumerate(order)}
+        pending = {c: sum(1 for p in c.parents if p in rank) for c in order}
+        ready = [rank[c] for c in order if not pending[c]]
+        heapq.heapify(ready)
+        column, lane_next = {}, {}
+        while ready:
+            commit = order[heapq.heappop(ready)]
+            col = lane_next.get(commit.branch_name, 0)
+            for parent in commit.parents:
+                if parent in column and column[parent] >= col: col = column[parent] + 1
+            column[commit] = col
+            lane_next[commit.branch_name] = col + 1
+            for child in commit.children:
+                pending[child] -= 1
+                if not pending[child]: heapq.heappush(ready, rank[child])
+        for commit, col in column.items():
+            self.commit_x_map[commit.id] = self.base_start_x + col * self.x_step
+        self.calculate_commit_positions(full=True)
+        self.save_data()
+        return old_width, self.current_max_x
+
+    # --- Quan hệ tổ tiên: generation number (1 + max của cha) cập nhật dần theo từng thao tác ---
+    LINEAGE_CACHE_SIZE = 32
+
+    def _rebuild_generations(self):
+        # Duyệt topo (Kahn), không giả định thứ tự tạo commit
+        self.generation, self._fp_depth, self._jump, self._merge_below = {}, {}, {}, {}
+        pending = {c: sum(1 for p in c.parents if p.id in self.all_commits) for c in self.all_commits.values()}
+        ready = deque(c for c, n in pending.items() if not n)
+        while ready:
+            commit = ready.popleft()
+            self._index_commit(commit)
+            for child in commit.children:
+                pending[child] -= 1
+                if not pending[child]: ready.append(child)
+        self._lineage_cache.clear()
+
+    def _index_commit(self, commit):
+        # Cha đã được đánh chỉ mục trước -> tính generation, độ sâu và con trỏ nhảy của commit
+        self.generation[commit.id] = 1 + max((self.generation.get(p.id, 0) for p in commit.parents), default=0)
+        parent = commit.parents[0] if commit.parents else None
+        if parent is None or parent.id not in self._fp_depth:
+            self._fp_depth[commit.id], self._jump[commit.id], self._merge_below[commit.id] = 0, None, None
+            return
+        self._merge_below[commit.id] = commit if len(commit.parents) > 1 else self._merge_below[parent.id]
+        self._fp_depth[commit.id] = self._fp_depth[parent.id] + 1
+        # Myers: nhảy xa gấp đôi khi hai bước nhảy liền trước dài bằng nhau -> tìm tổ tiên O(log n)
+        jump = self._jump[parent.id]
+        jump2 = self._jump[jump.id] if jump is not None else None
+        if jump2 is not None and self._fp_depth[parent.id] - self._fp_depth[jump.id] == self._fp_depth[jump.id] - self._fp_depth[jump2.id]:
+            self._jump[commit.id] = jump2
+        else:
+            self._jump[commit.id] = parent
+
+    def _raise_generation(self, commit):
+        # Thêm cạnh cha muộn (add_parent) có thể đẩy generation của commit và con cháu lên
+        queue = deque([commit])
+        while queue:
+            c = queue.popleft()
+            gen = 1 + max((self.generation.get(p.id, 0) for p in c.parents), default=0)
+            if gen <= self.generation.get(c.id, 0): continue
+            self.generation[c.id] = gen
+            queue.extend(c.children)
+
+    def _refresh_merge_below(self, commit):
+        # commit vừa thành merge -> cập nhật merge gần nhất cho nó và con cháu theo chuỗi cha chính
+        # (dừng ở merge khác: merge đó vẫn là merge gần nhất của phần phía sau)
+        stack = [commit]
+        while stack:
+            c = stack.pop()
+            if c.id not in self._fp_depth: continue
+            first = c.parents[0] if c.parents else None
+            self._merge_below[c.id] = c if len(c.parents) > 1 else (self._merge_below.get(first.id) if first else None)
+            stack.extend(child for child in c.children if child.parents[0] is c and len(child.parents) == 1)
+
+    def check_ancestry_index(self):
+        """
+        So các chỉ mục tổ tiên đang cập nhật dần với bản dựng lại từ đầu; trả về id các commit lệch
+        (rỗng = đúng). Dùng cho `gitflow_cli.py PROJECT check`.
+        """
+        current = (self.generation, self._fp_depth, self._jump, self._merge_below)
+        self._rebuild_generations()
+        fresh = (self.generation, self._fp_depth, self._jump, self._merge_below)
+        self.generation, self._fp_depth, self._jump, self._merge_below = current
+        return sorted(cid for cid in self.all_commits if any(a.get(cid) != b.get(cid) for a, b in zip(current, fresh)))
+
+    def first_parent_ancestor(self, commit_id, depth):
+        # Tổ tiên trên chuỗi cha chính ở độ sâu cho trước, O(log n) nhờ con trỏ nhảy
+        commit = self.all_commits[commit_id]
+        if depth < 0 or depth > self._fp_depth[commit.id]: return None
+        while self._fp_depth[commit.id] > depth:
+            jump = self._jump[commit.id]
+            commit = jump if self._fp_depth[jump.id] >= depth else commit.parents[0]
+        return commit
+
+    def is_ancestor(self, ancestor_id, commit_id):
+        """True nếu ancestor_id là tổ tiên (hoặc chính là) commit_id."""
+        if ancestor_id == commit_id: return True
+        target = self.all_commits[ancestor_id]
+        target_gen = self.generation[ancestor_id]
+        if target_gen >= self.generation[commit_id]: return False
+        # Mỗi chuỗi cha chính: kiểm tra target có nằm trên chuỗi không (O(log n) nhờ con trỏ nhảy),
+        # rồi chỉ nhảy qua các commit merge trên chuỗi để rẽ sang nhánh được merge vào.
+        # Commit có generation <= của target không thể dẫn tới target -> dừng.
+        target_depth = self._fp_depth[ancestor_id]
+        stack, queued, merges_done = [self.all_commits[commit_id]], set(), set()
+        while stack:
+            start = stack.pop()
+            if self._fp_depth[start.id] >= target_depth and self.first_parent_ancestor(start.id, target_depth) is target:
+                return True
+            merge = self._merge_below[start.id]
+            while merge is not None and merge not in merges_done and self.generation[merge.id] > target_gen:
+                merges_done.add(merge)
+                for parent in merge.parents[1:]:
+                    if parent is target: return True
+                    if parent not in queued and self.generation.get(parent.id, 0) > target_gen:
+                        queued.add(parent)
+                        stack.append(parent)
+                merge = self._merge_below.get(merge.parents[0].id)
+        return False
+
+    def _walk_by_generation(self, starts, stop_flag=0):
+        # Duyệt tổ tiên theo generation giảm dần: khi một commit được lấy ra, mọi con cháu của nó
+        # trong vùng duyệt đã được xét nên cờ của nó đã đầy đủ. Cờ được truyền từ con xuống cha.
+        # stop_flag: dừng khi mọi commit còn trong hàng đợi đều mang cờ này (đếm số commit chưa mang
+        # cờ, không quét lại cả hàng đợi mỗi bước)
+        flags = {}
+        for commit, flag in starts: flags[commit] = flags.get(commit, 0) | flag
+        heap = [(-self.generation[c.id], c.id, c) for c in flags]
+        heapq.heapify(heap)
+        open_count = sum(1 for flag in flags.values() if not flag & stop_flag)
+        while heap and (not stop_flag or open_count):
+            _, _, commit = heapq.heappop(heap)
+            flag = flags[commit]
+            if not flag & stop_flag: open_count -= 1
+            yield commit, flag
+            for parent in commit.parents:
+                old = flags.get(parent)
+                if parent.id not in self.all_commits or (old is not None and old | flag == old): continue
+                new = (old or 0) | flag
+                if old is None:
+                    heapq.heappush(heap, (-self.generation[parent.id], parent.id, parent))
+                    if not new & stop_flag: open_count += 1
+                elif not old & stop_flag and new & stop_flag: open_count -= 1
+                flags[parent] = new
+
+    def merge_base(self, commit_a, commit_b):
+        """Tổ tiên chung gần nhất (generation lớn nhất) của hai commit, None nếu không có."""
+        if self.is_ancestor(commit_a, commit_b): return commit_a
+        if self.is_ancestor(commit_b, commit_a): return commit_b
+        starts = [(self.all_commits[commit_a], 1), (self.all_commits[commit_b], 2)]
+        for commit, flag in self._walk_by_generation(starts):
+            if flag == 3: return commit.id
+        return None
+
+    def commits_between(self, base_id, commit_id):
+        """Các commit tới được từ commit_id nhưng không từ base_id (như git base..commit), mới nhất trước."""
+        # Cờ 1: tổ tiên của base; dừng khi trong hàng đợi chỉ còn commit mang cờ 1
+        starts = [(self.all_commits[base_id], 1), (self.all_commits[commit_id], 2)]
+        return [commit.id for commit, flag in self._walk_by_generation(starts, stop_flag=1) if flag == 2]
+
+    # --- Tìm kiếm: id, message, tag, nhánh và nội dung ghi chú ---
+    # Dựng index chỉ từ dữ liệu trong RAM (ghi chú dùng note_preview); chữ đầy đủ của ghi chú dài
+    # được đọc sau, trên thread nền (long_note_texts -> index_note_texts)
+    SEARCH_FIELDS = frozenset(("message", "is_tag", "branch_name"))
+
+    def _search_text(self, commit):
+        note = self._note_texts.get(commit.id, commit.note_preview)
+        return f"{commit.id} {commit.message} {commit.is_tag or ''} {commit.branch_name} {note}"
+
+    def _reindex(self, commit):
+        if self._search is not None: self._search.set(commit.id, self._search_text(commit))
+
+    def long_note_texts(self):
+        """{id: chữ thuần đầy đủ} của các ghi chú bị cắt ở note_preview. Chỉ đọc file -> chạy được trên thread nền."""
+        return {c.id: self.plain_note(c) for c in list(self.all_commits.values()) if c.note_preview.endswith("…")}
+
+    def index_note_texts(self, texts):
+        # Ghi chú được sửa trong lúc đọc nền đã có bản mới hơn -> giữ bản đó
+        self.note_texts_loaded = True
+        for commit_id, text in texts.items():
+            commit = self.all_commits.get(commit_id)
+            if commit is None or commit_id in self._note_texts: continue
+            self._note_texts[commit_id] = text
+            self._reindex(commit)
+
+    def search(self, query):
+        """Tập id commit khớp câu tìm; chỉ tính lại khi câu tìm hoặc dữ liệu đổi."""
+        if self._search is None:
+            self._search = SearchIndex()
+            for commit in self.all_commits.values(): self._reindex(commit)
+        cached = self._search_result
+        if cached and cached[0] == query and cached[1] == self._search.version: return cached[2]
+        result = self._search.search(query)
+        self._search_result = (query, self._search.version, result)
+        return result
+
+    def lineage(self, commit_id):
+        """
+        (các node, các cạnh (cha, con)) nằm trên đường đi qua commit: toàn bộ tổ tiên + con cháu.
+        Kết quả được nhớ lại (LRU) cho tới khi graph thay đổi.
+        """
+        cached = self._lineage_cache.get(commit_id)
+        if cached is not None:
+            self._lineage_cache.move_to_end(commit_id)
+            return cached
+        start = self.all_commits.get(commit_id)
+        nodes, links = {commit_id}, set()
+        if start is not None:
+            for forward in (False, True):
+                queue, seen = deque([start]), {start}
+                while queue:
+                    c = queue.popleft()
+                    for nxt in (c.children if forward else c.parents):
+                        links.add((c.id, nxt.id) if forward else (nxt.id, c.id))
+                        nodes.add(nxt.id)
+                        if nxt not in seen:
+                            seen.add(nxt)
+                            queue.append(nxt)
+        result = (frozenset(nodes), frozenset(links))
+        self._lineage_cache[commit_id] = result
+        while len(self._lineage_cache) > self.LINEAGE_CACHE_SIZE: self._lineage_cache.popitem(last=False)
+        return result
+
+    # --- Chỉ mục không gian cho canvas: chỉ vẽ node / cạnh / lane nằm trong vùng cần vẽ ---
+
+    def _lane_box(self, name):
+        y = self.branch_line_offset[name]
+        return (0, y - self.y_step / 2, math.inf, y + self.y_step / 2)
+
+    def _place_commit(self, index, commit, with_children=True):
+        index.set(commit, (commit.x, commit.y, commit.x, commit.y))
+        edges = [(p, commit) for p in commit.parents]
+        if with_children: edges.extend((commit, c) for c in commit.children)
+        for parent, child in edges:
+            index.set((parent, child), (min(parent.x, child.x), min(parent.y, child.y),
+                                        max(parent.x, child.x), max(parent.y, child.y)))
+
+    def spatial_index(self):
+        if self._spatial is None:
+            self._spatial = SpatialIndex(8 * self.x_step, 4 * self.y_step)
+            for name in self.branches:
+                if name in self.branch_line_offset: self._spatial.set(name, self._lane_box(name))
+            for commit in self.all_commits.values(): self._place_commit(self._spatial, commit, with_children=False)
+        else:
+            for name in self._spatial_pending_lanes:
+                if name in self.branches: self._spatial.set(name, self._lane_box(name))
+            for commit in self._spatial_pending:
+                if self.all_commits.get(commit.id) is commit: self._place_commit(self._spatial, commit)
+        self._spatial_pending.clear()
+        self._spatial_pending_lanes.clear()
+        return self._spatial
+
+    def visible(self, x0, y0, x1, y1):
+        """(tên lane, cạnh (cha, con), commit) có hộp bao giao với vùng (x0, y0)-(x1, y1)."""
+        lanes, edges, nodes = [], [], []
+        for key in self.spatial_index().query(x0, y0, x1, y1):
+            (lanes if isinstance(key, str) else edges if isinstance(key, tuple) else nodes).append(key)
+        return lanes, edges, nodes
+
+    # --- Các thao tác trên graph: cập nhật bộ nhớ + ghi một dòng journal ---
+
+    def add_commit(self, commit, parents):
+        # Thêm commit vào cuối nhánh của nó, nối với các commit cha (thứ tự cha được giữ nguyên)
+        branch = self.branches[commit.branch_name]
+        for parent in parents:
+            commit.add_parent(parent)
+            parent.add_child(commit)
+        branch.head = commit
+        branch.commits[commit] = None
+        self.all_commits[commit.id] = commit
+        self.current_max_x += self.x_step
+        self.commit_x_map[commit.id] = self.current_max_x
+        commit.x = self.current_max_x
+        self._dirty_commits.add(commit)
+        if self._spatial is not None: self._spatial_pending.add(commit)
+        self.render_version += 1
+        self._index_commit(commit)
+        self._lineage_cache.clear()
+        self._reindex(commit)
+        self._record("add_commit", commit=commit.to_dict(), counter=self.commit_counter)
+
+    def add_parent(self, child_id, parent_id):
+        child, parent = self.all_commits[child_id], self.all_commits[parent_id]
+        had_parent = bool(child.parents)
+        child.add_parent(parent)
+        parent.add_child(child)
+        if had_parent:
+            # Cha chính giữ nguyên (độ sâu, con trỏ nhảy không đổi) nhưng child giờ là merge
+            self._raise_generation(child)
+            self._refresh_merge_below(child)
+        else: self._rebuild_generations()  # Cha chính mới -> độ sâu của cả nhánh con đổi
+        self._lineage_cache.clear()
+        if self._spatial is not None: self._spatial_pending.add(child)
+        self.render_version += 1
+        self._record("add_parent", child=child_id, parent=parent_id)
+
+    def delete_commit(self, commit_id):
+        commit = self.all_commits[commit_id]
+        for parent in commit.parents:
+            parent.remove_child(commit)
+        branch = self.branches.get(commit.branch_name)
+        if branch:
+            branch.commits.pop(commit, None)
+            if not branch.commits:
+                # Nhánh không còn commit nào -> bỏ nhánh, tránh head trỏ vào commit đã xóa
+                del self.branches[commit.branch_name]
+                self.branch_line_offset.pop(commit.branch_name, None)  # Tạo lại cùng tên -> lane được tính và đánh chỉ mục lại
+                if self._spatial is not None: self._spatial.remove(commit.branch_name)
+                self._record("delete_branch", name=commit.branch_name)
+            elif branch.head is commit:
+                branch.head = max(branch.commits, key=lambda c: c.x)
+        del self.all_commits[commit_id]
+        self.commit_x_map.pop(commit_id, None)
+        self._dirty_commits.discard(commit)
+        if self._spatial is not None:
+            self._spatial_pending.discard(commit)
+            for key in [commit, *((p, commit) for p in commit.parents), *((commit, c) for c in commit.children)]:
+                self._spatial.remove(key)
+        self.render_version += 1
+        for index in (self.generation, self._fp_depth, self._jump, self._merge_below): index.pop(commit_id, None)
+        self._lineage_cache.clear()
+        if self._search is not None: self._search.remove(commit_id)
+        self._note_texts.pop(commit_id, None)
+        if commit.x >= self.current_max_x:
+            self.current_max_x = max(self.commit_x_map.values(), default=self.base_start_x)
+        self._note_cache.pop(commit_id, None)
+        if commit.note_ref and os.path.exists(self._note_path(commit.note_ref)): os.remove(self._note_path(commit.note_ref))
+        self._record("delete_commit", id=commit_id)
+
+    def update_commit(self, commit_id, **fields):
+        commit = self.all_commits[commit_id]
+        for key, value in fields.items(): setattr(commit, key, value)
+        if not self.SEARCH_FIELDS.isdisjoint(fields): self._reindex(commit)
+        if self._spatial is not None: self._spatial_pending.add(commit)
+        self.render_version += 1
+        self._record("update_commit", id=commit_id, fields=fields)
+
+    def set_current_branch(self, name):
+        self.current_branch_name = name
+        self._record("set_branch", name=name)
+
+    def add_branch(self, name, color_key, first_commit, parents):
+        # Nhánh mới bắt đầu bằng first_commit (chưa có trong graph)
+        self.branches[name] = Branch(name, color_key, first_commit)
+        if self._spatial is not None: self._spatial_pending_lanes.add(name)
+        self._record("add_branch", name=name)
+        self.add_commit(first_commit, parents)
+
+    def _create_new_branch(self, name, color_key, new_commit, start_commit):
+        self.add_branch(name, color_key, new_commit, [start_commit])
+        self.set_current_branch(name)
+        self.calculate_commit_positions()
+
+    # --- Thao tác Git Flow (dùng chung cho menu trên canvas và gitflow_cli.py), trả về id commit mới ---
+    BRANCH_KINDS = {'feature': "Start", 'hotfix': "Hotfix", 'develop': "Dev Init"}
+
+    def push_commit(self, from_id, message="WIP"):
+        commit = self.all_commits[from_id]
+        if self.current_branch_name not in self.branches:
+            if commit.branch_name in self.branches: self.set_current_branch(commit.branch_name)
+            elif 'master' in self.branches: self.set_current_branch('master')
+            else: self.set_current_branch(next(iter(self.branches)))
+        nid = self._get_new_commit_id()
+        self.add_commit(Commit(nid, message, self.current_branch_name), [self.branches[self.current_branch_name].head, commit])
+        self.link_commit_files(from_id, nid)
+        self.calculate_commit_positions()
+        return nid
+
+    def create_branch(self, kind, from_id):
+        if kind not in self.BRANCH_KINDS: raise ValueError(f"Không có loại nhánh: {kind}")
+        if kind == 'develop' and 'develop' in self.branches: raise ValueError("Nhánh Develop đã tồn tại.")
+        name = kind if kind == 'develop' else f"{kind}/{self.commit_counter}"
+        nid = self._get_new_commit_id()
+        self._create_new_branch(name, kind, Commit(nid, self.BRANCH_KINDS[kind], name), self.all_commits[from_id])
+        self.link_commit_files(from_id, nid)
+        return nid
+
+    def merge_into(self, from_id, target_name):
+        if target_name not in self.branches: raise ValueError(f"Không có nhánh: {target_name}")
+        commit = self.all_commits[from_id]
+        target = self.branches[target_name]
+        nid = self._get_new_commit_id()
+        self.add_commit(Commit(nid, f"Merge {commit.branch_name}", target.name), [target.head, commit])
+        self.set_current_branch(target.name)
+        self.link_commit_files(from_id, nid)
+        self.calculate_commit_positions()
+        return nid
+
+    def remove_commit(self, commit_id):
+        commit = self.all_commits[commit_id]
+        if commit.children: raise ValueError("Không thể xóa node ở giữa (Node này đang có node con)!")
+        self.delete_commit(commit_id)
+        if commit.source_id == commit.id:
+            try: self.drop_snapshot(commit_id)
+            except Exception: pass
+        self.calculate_commit_positions()
+
+    def attach_folder(self, commit_id, src, verify_hash=False):
+        # Nạp folder vào commit (như nút Upload), trả về SyncReport
+        report = SyncReport()
+        files = self.build_snapshot(src, previous=self.get_manifest(commit_id), verify_hash=verify_hash, report=report)
+        self.set_snapshot(commit_id, files)
+        return report
+
+    # --- Ghi chú: lưu riêng từng file trong Notes/, đọc khi cần qua cache LRU nhỏ ---
+    NOTE_CACHE_SIZE = 16
+    NOTE_PREVIEW_LEN = 80
+
+    @staticmethod
+    def note_text(html_text):
+        # HTML ghi chú -> chữ thuần (dùng cho xem trước và tìm kiếm)
+        text = re.sub(r'<head>.*?</head>', ' ', html_text, flags=re.S | re.I)
+        text = html.unescape(re.sub(r'<[^>]+>', ' ', text))
+        return " ".join(text.split())
+
+    @classmethod
+    def note_preview(cls, html_text):
+        text = cls.note_text(html_text)
+        return text if len(text) <= cls.NOTE_PREVIEW_LEN else text[:cls.NOTE_PREVIEW_LEN - 1] + "…"
+
+    def _note_path(self, note_ref):
+        return os.path.join(self.notes_dir, note_ref)
+
+    def _write_note(self, commit_id, html_text):
+        note_ref = f"{commit_id}.html"
+        path = self._note_path(note_ref)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f: f.write(html_text)
+        os.replace(tmp, path)
+        return note_ref, self.note_preview(html_text)
+
+    def get_note(self, commit_id):
+        if commit_id in self._note_cache:
+            self._note_cache.move_to_end(commit_id)
+            return self._note_cache[commit_id]
+        text = self._read_note(self.all_commits[commit_id])
+        self._cache_note(commit_id, text)
+        return text
+
+    def plain_note(self, commit):
+        # Chữ thuần của ghi chú, không đẩy vào LRU (dùng khi duyệt cả dự án)
+        note_html = self._note_cache.get(commit.id)
+        if note_html is None: note_html = self._read_note(commit)
+        return self.note_text(note_html)
+
+    def _read_note(self, commit):
+        if commit.note_ref and os.path.exists(self._note_path(commit.note_ref)):
+            with open(self._note_path(commit.note_ref), 'r', encoding='utf-8') as f: return f.read()
+        return ""
+
+    def _cache_note(self, commit_id, text):
+        self._note_cache[commit_id] = text
+        self._note_cache.move_to_end(commit_id)
+        while len(self._note_cache) > self.NOTE_CACHE_SIZE: self._note_cache.popitem(last=False)
+
+    # --- Asset (ảnh chèn vào ghi chú): Assets/<hash><đuôi> + thumbnail Assets/thumbs/<hash>.png ---
+    ASSET_THUMB_WIDTH = 400
+
+    def add_asset(self, path):
+        # Chép ảnh vào kho của dự án (trùng nội dung thì dùng lại) và tạo sẵn thumbnail
+        name = self.blobs.hash_file(path) + os.path.splitext(path)[1].lower()
+        target = self.asset_path(name)
+        if not os.path.exists(target):
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            fast_copy(path, tmp)
+            os.replace(tmp, target)
+        self.asset_thumbnail_path(name)
+        return name
+
+    def asset_path(self, name):
+        return os.path.join(self.assets_dir, os.path.basename(name))
+
+    def asset_thumbnail_path(self, name):
+        original = self.asset_path(name)
+        thumb = os.path.join(self.assets_dir, 'thumbs', os.path.splitext(os.path.basename(name))[0] + '.png')
+        if os.path.exists(thumb): return thumb
+        # Thumbnail không có trong backup -> tạo lại khi cần
+        if os.path.exists(original):
+            return thumb if make_thumbnail(original, thumb, self.ASSET_THUMB_WIDTH) else original
+        return None
+
+    def update_note(self, commit_id, text, persist=True):
+        if commit_id in self.all_commits:
+            self._cache_note(commit_id, text)
+            self.all_commits[commit_id].note_preview = self.note_preview(text)
+            self._note_texts[commit_id] = self.note_text(text)
+            self._reindex(self.all_commits[commit_id])
+            if persist: self.persist_note(commit_id, text)
+
+    def persist_note(self, commit_id, text):
+        # Được NoteWriter gọi từ thread nền
+        commit = self.all_commits.get(commit_id)
+        if commit is None: return  # Commit đã bị xóa trong lúc chờ ghi
+        note_ref, preview = self._write_note(commit_id, text)
+        commit.note_ref = note_ref
+        self._record("update_note", compact=False, id=commit_id, note_ref=note_ref, note_preview=preview)
+
+
+def project_summary(commit_count, branch_names, stamp):
+    mtimes = stamp[0::2]
+    return {"commits": commit_count, "branches": branch_names, "modified": max(mtimes) / 1e9 if mtimes else 0}
+
+def scan_project_summary(project_dir):
+    """Tóm tắt một dự án chưa nạp (như ProjectEngine.summary): graph.bin nếu còn khớp, không thì đọc dữ liệu gốc."""
+    storage = SqliteStorage(project_dir)
+    if not storage.exists(): storage = JsonStorage(project_dir)
+    try:
+        stamp = storage.stamp()
+        found = GraphSnapshot(project_dir).summary(stamp)
+        if found is None:
+            data = storage.load()
+            if data is None: return None
+            # Như _attach_graph: chỉ giữ nhánh còn commit
+            live = {c_data["branch_name"] for c_data in data["commits"].values()}
+            found = len(data["commits"]), [name for name in data["branches"] if name in live]
+        return project_summary(*found, stamp)
+    except Exception:
+        return None  # Dữ liệu hỏng -> để trống, dựng lại khi nạp dự án
+    finally:
+        storage.close()
+
+class ProjectIndex:
+    """
+    Bảng tóm tắt các dự án (số commit, danh sách nhánh, lần sửa cuối) trong DATA_ROOT_DIR:
+    đủ để vẽ header của mọi dự án ngay khi mở app mà chưa phải nạp engine nào.
+    """
+    FILE_NAME = '.projects_index.json'
+
+    def __init__(self, root):
+        self.path = os.path.join(root, self.FILE_NAME)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f: self.entries = json.load(f)
+            except Exception:
+                pass  # Index hỏng -> dựng lại dần khi nạp từng dự án
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def update(self, engine):
+        self.entries[engine.project_name] = engine.summary()
+        self.save()
+
+    def remove(self, name):
+        if self.entries.pop(name, None) is not None: self.save()
+
+    def fill_missing(self, root, names):
+        # Dự án chưa từng nạp (chưa có trong index) -> quét nhẹ một lần để header không trống
+        found = {}
+        for name in names:
+            if name in self.entries: continue
+            summary = scan_project_summary(os.path.join(root, name))
+            if summary: found[name] = summary
+        if found:
+            self.entries.update(found)
+            self.save()
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(self.entries, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,287 @@
+"""
+Trao đổi với repo git thật (gọi lệnh `git`, không cần thư viện ngoài, không import Qt).
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import OrderedDict
+
+from gitflow_engine import Commit, branch_color_key
+
+class GitImporter:
+    """
+    Nhập lịch sử một repo git vào ProjectEngine theo kiểu dòng chảy: đọc từng dòng `git log`
+    (thứ tự topo, cha trước con) và thêm commit ngay, không giữ toàn bộ output trong RAM;
+    mỗi commit chỉ để lại một mục sha (20 byte) -> Commit để nối cha.
+
+    Lane: commit nằm trên chuỗi cha chính (first-parent) của nhánh nào thì thuộc nhánh đó, ưu tiên
+    master/main > develop > release > hotfix > nhánh khác; commit không nằm trên chuỗi nào (nhánh đã
+    merge rồi xóa) lấy theo ref đã dẫn tới nó (--source). Toàn bộ lần nhập chỉ ghi dữ liệu một lần.
+    """
+    PROGRESS_EVERY = 1000
+    CHUNK_SIZE = 64 * 1024
+    PRIORITY = ('master', 'develop', 'release', 'hotfix')
+    LOG_FORMAT = '%H%x1f%P%x1f%ct%x1f%S%x1f%D%x1f%s'
+    FILE_MODES = {'100644': 0o644, '100755': 0o755, '120000': 0o644}  # Symlink: lưu đường dẫn đích như file thường
+
+    def __init__(self, engine, repo, progress=None, git='git'):
+        self.engine = engine
+        self.repo = repo
+        self.progress = progress
+        self.git = git
+        self._blob_digests = {}  # sha blob git -> hash trong kho object (snapshot dùng chung file)
+        self._cat = None
+
+    def _command(self, *args):
+        return [self.git, '-C', self.repo, '-c', 'log.showSignature=false', *args]
+
+    def _output(self, *args):
+        result = subprocess.run(self._command(*args), capture_output=True)
+        if result.returncode: raise ValueError(result.stderr.decode('utf-8', 'replace').strip() or f"git {args[0]} lỗi")
+        return result.stdout.decode('utf-8', 'replace').strip()
+
+    def _records(self, *args, sep=b'\n'):
+        # Đọc output theo từng đoạn, trả từng bản ghi; dừng giữa chừng thì dừng luôn tiến trình git
+        proc = subprocess.Popen(self._command(*args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        finished = False
+        try:
+            rest = b''
+            for chunk in iter(lambda: proc.stdout.read(self.CHUNK_SIZE), b''):
+                parts = (rest + chunk).split(sep)
+                rest = parts.pop()
+                for part in parts: yield part.decode('utf-8', 'replace')
+            if rest: yield rest.decode('utf-8', 'replace')
+            finished = True
+        finally:
+            if not finished: proc.kill()
+            proc.stdout.close()
+            error = proc.stderr.read().decode('utf-8', 'replace').strip()
+            proc.stderr.close()
+            if proc.wait() and finished: raise ValueError(error or f"git {args[0]} lỗi")
+
+    def refs(self):
+        # [(tên nhánh, sha head)] theo thứ tự ưu tiên lane
+        refs = [line.split(' ', 1)[::-1] for line in
+                self._output('for-each-ref', '--format=%(objectname) %(refname:short)', 'refs/heads').splitlines()]
+        def rank(ref):
+            key = self.lane_name(ref[0]).split('/', 1)[0]
+            return (self.PRIORITY.index(key) if key in self.PRIORITY else len(self.PRIORITY), ref[0])
+        return sorted(refs, key=rank)
+
+    def first_parent_lanes(self, refs):
+        # Một lượt `rev-list --parents` cho cả repo (không chạy git riêng cho từng nhánh), rồi lần theo
+        # chuỗi cha chính của từng nhánh; gặp commit đã có lane thì phần còn lại cũng đã có.
+        # Trả về (lane theo sha, tổng số commit)
+        first_parent = {}
+        for line in self._records('rev-list', '--parents', *(name for name, head in refs)):
+            shas = line.split()
+            if shas: first_parent[bytes.fromhex(shas[0])] = bytes.fromhex(shas[1]) if len(shas) > 1 else None
+        lanes = {}
+        for name, head in refs:
+            lane = self.lane_name(name)
+            key = bytes.fromhex(head)
+            while key is not None and key not in lanes:
+                lanes[key] = lane
+                key = first_parent.get(key)
+        return lanes, len(first_parent)
+
+    @staticmethod
+    def lane_name(ref):
+        for prefix in ('refs/heads/', 'refs/remotes/', 'refs/tags/'):
+            if ref.startswith(prefix):
+                ref = ref[len(prefix):]
+                if prefix == 'refs/remotes/': ref = ref.split('/', 1)[-1]
+                break
+        return 'master' if ref in ('main', 'HEAD', '') else ref
+
+    def run(self, snapshots=()):
+        """
+        Nhập mọi nhánh local. snapshots: danh sách rev (sha, tag, tên nhánh) cần dựng luôn snapshot file.
+        Trả về số commit đã nhập.
+        """
+        engine = self.engine
+        refs = self.refs()
+        if not refs: raise ValueError("Repo không có nhánh nào")
+        wanted = {bytes.fromhex(self._output('rev-parse', '--verify', f'{rev}^{{commit}}')) for rev in snapshots}
+        lanes, total = self.first_parent_lanes(refs)
+
+        by_sha = {}
+        count = 0
+        with engine.batch(snapshot=True):
+            engine.drop_seed_commit()  # Dự án mới tạo cho lần nhập: không giữ root "Init" thừa
+            try:
+                for line in self._records('log', '--topo-order', '--reverse', '--source', '--decorate=full',
+                                          f'--format={self.LOG_FORMAT}', *(name for name, head in refs)):
+                    sha, parents, ctime, source, decorations, subject = line.split('\x1f', 5)
+                    key = bytes.fromhex(sha)
+                    name = lanes.pop(key, None) or self.lane_name(source)
+                    tags = [d[len('tag: refs/tags/'):] for d in decorations.split(', ') if d.startswith('tag: refs/tags/')]
+                    commit = Commit(engine._get_new_commit_id(), f"{sha[:7]} {subject}", name,
+                                    is_tag=tags[0] if tags else None)
+                    # Clone nông (shallow): cha không có trong repo thì bỏ qua
+                    parent_commits = [by_sha[p] for p in map(bytes.fromhex, parents.split()) if p in by_sha]
+                    if name in engine.branches: engine.add_commit(commit, parent_commits)
+                    else: engine.add_branch(name, branch_color_key(name), commit, parent_commits)
+                    by_sha[key] = commit
+                    if key in wanted: self.import_snapshot(commit.id, sha, int(ctime))
+                    count += 1
+                    if self.progress and count % self.PROGRESS_EVERY == 0: self.progress(count, total, subject)
+            finally:
+                if self._cat:
+                    self._cat.stdin.close()
+                    self._cat.wait()
+                    self._cat = None
+            if 'master' in engine.branches: engine.set_current_branch('master')
+            engine.relayout()
+        if self.progress: self.progress(count, total, "")
+        return count
+
+    def _read_blob(self, sha):
+        # Một tiến trình `git cat-file --batch` dùng cho mọi file của mọi snapshot
+        if self._cat is None:
+            self._cat = subprocess.Popen(self._command('cat-file', '--batch'), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._cat.stdin.write(sha.encode() + b'\n')
+        self._cat.stdin.flush()
+        header = self._cat.stdout.readline().split()
+        if len(header) < 3 or header[1] == b'missing': raise ValueError(f"git cat-file: thiếu {sha}")
+        data = self._cat.stdout.read(int(header[2]))
+        self._cat.stdout.read(1)  # '\n' sau nội dung
+        return data
+
+    def import_snapshot(self, commit_id, sha, ctime):
+        # Dựng manifest từ cây file của commit git; nội dung đi thẳng vào kho object
+        files = {}
+        mtime_ns = ctime * 1_000_000_000
+        for record in self._records('ls-tree', '-r', '-z', '--long', sha, sep=b'\0'):
+            if not record: continue
+            meta, path = record.split('\t', 1)
+            mode, kind, blob, size = meta.split()
+            if kind != 'blob': continue  # Submodule
+            digest = self._blob_digests.get(blob)
+            if digest is None:
+                digest = self._blob_digests[blob] = self.engine.blobs.put_bytes(self._read_blob(blob))
+            files[path] = [digest, int(size), mtime_ns, self.FILE_MODES.get(mode, 0o644)]
+        self.engine.set_snapshot(commit_id, files)
+
+class GitExporter:
+    """
+    Xuất dự án thành luồng `git fast-import`: commit theo thứ tự topo (cha trước con), mỗi nhánh
+    thành refs/heads/<nhánh>, tag thành refs/tags/<tag>, ghi chú nối vào message.
+
+    Mỗi nội dung file (hash trong kho object) chỉ được ghi một lần thành blob có mark; snapshot dùng
+    chung qua source_id / commit sau trỏ lại mark cũ. Cây file ghi dạng thay đổi so với cha chính,
+    nội dung file chép thẳng từ kho object theo từng đoạn -> không nạp snapshot nào vào RAM.
+    """
+    PROGRESS_EVERY = 1000
+    MANIFEST_CACHE_SIZE = 16
+    AUTHOR = 'GitFlow <gitflow@localhost>'
+
+    def __init__(self, engine, progress=None, git='git', author=None, timestamp=None):
+        self.engine = engine
+        self.progress = progress
+        self.git = git
+        self.author = author or self.AUTHOR
+        self.timestamp = timestamp
+        self._manifests = OrderedDict()
+
+    def _manifest(self, commit):
+        if not commit.has_folder: return {}
+        files = self._manifests.get(commit.source_id)
+        if files is None:
+            files = self._manifests[commit.source_id] = self.engine._load_manifest(commit.source_id, cache=False)
+            while len(self._manifests) > self.MANIFEST_CACHE_SIZE: self._manifests.popitem(last=False)
+        else: self._manifests.move_to_end(commit.source_id)
+        return files
+
+    @staticmethod
+    def _path(rel):
+        # fast-import cần quote kiểu C khi đường dẫn bắt đầu bằng '"' hoặc có xuống dòng
+        if not rel.startswith('"') and '\n' not in rel: return rel.encode('utf-8')
+        escaped = rel.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return f'"{escaped}"'.encode('utf-8')
+
+    @staticmethod
+    def _ref_name(name):
+        return "-".join(name.split()) or None
+
+    def _message(self, commit):
+        note = self.engine.plain_note(commit)
+        return f"{commit.message}\n\n{note}\n" if note else f"{commit.message}\n"
+
+    def write(self, out):
+        """Ghi luồng fast-import vào out (file nhị phân). Trả về số commit đã xuất."""
+        engine = self.engine
+        commits = sorted(engine.all_commits.values(), key=lambda c: (engine.generation.get(c.id, 0), c.x))
+        total = len(commits)
+        # Dự án không lưu thời gian commit -> mỗi commit cách nhau 1 giây để `git log` giữ đúng thứ tự
+        start = (self.timestamp if self.timestamp is not None else int(time.time())) - total
+        marks, blob_marks, tags = {}, {}, {}
+        next_mark = 1
+        for count, commit in enumerate(commits, 1):
+            files = self._manifest(commit)
+            first = commit.parents[0] if commit.parents else None
+            if first is None: changes, removed = files.items(), ()
+            elif (first.has_folder, first.source_id) == (commit.has_folder, commit.source_id): changes, removed = (), ()
+            else:
+                parent_files = self._manifest(first)
+                changes = [(rel, entry) for rel, entry in files.items()
+                           if (parent_files.get(rel) or [None])[0::3] != entry[0::3]]
+                removed = [rel for rel in parent_files if rel not in files]
+            file_lines = []
+            for rel, (digest, size, mtime_ns, mode) in changes:
+                if digest not in blob_marks:
+                    path = engine.blobs.blob_path(digest)
+                    out.write(b'blob\nmark :%d\ndata %d\n' % (next_mark, os.path.getsize(path)))
+                    with open(path, 'rb') as f: shutil.copyfileobj(f, out)
+                    out.write(b'\n')
+                    blob_marks[digest] = next_mark
+                    next_mark += 1
+                file_lines.append(b'M %s :%d %s\n' % (b'100755' if mode & 0o111 else b'100644', blob_marks[digest], self._path(rel)))
+            file_lines.extend(b'D %s\n' % self._path(rel) for rel in removed)
+
+            ref = f"refs/heads/{self._ref_name(commit.branch_name) or 'master'}".encode('utf-8')
+            # Commit gốc: reset để fast-import không lấy đỉnh hiện tại của nhánh làm cha
+            if first is None: out.write(b'reset %s\n' % ref)
+            message = self._message(commit).encode('utf-8')
+            out.write(b'commit %s\nmark :%d\ncommitter %s %d +0000\ndata %d\n%s'
+                      % (ref, next_mark, self.author.encode('utf-8'), start + count, len(message), message))
+            for i, parent in enumerate(commit.parents):
+                out.write(b'%s :%d\n' % (b'merge' if i else b'from', marks[parent.id]))
+            out.writelines(file_lines)
+            out.write(b'\n')
+            marks[commit.id] = next_mark
+            next_mark += 1
+            tag = self._ref_name(commit.is_tag or "")
+            if tag: tags.setdefault(tag, next_mark - 1)
+            if self.progress and count % self.PROGRESS_EVERY == 0: self.progress(count, total, commit.message)
+
+        for name, branch in engine.branches.items():
+            if branch.head and branch.head.id in marks:
+                out.write(b'reset refs/heads/%s\nfrom :%d\n\n' % (self._ref_name(name).encode('utf-8'), marks[branch.head.id]))
+        for tag, mark in tags.items():
+            out.write(b'reset refs/tags/%s\nfrom :%d\n\n' % (tag.encode('utf-8'), mark))
+        if self.progress: self.progress(total, total, "")
+        return total
+
+    def export_to_repo(self, repo):
+        """Xuất vào repo git (tạo mới nếu chưa có) qua `git fast-import`. Trả về số commit đã xuất."""
+        fresh = not os.path.exists(os.path.join(repo, '.git'))
+        subprocess.run([self.git, 'init', '-q', repo], check=True, capture_output=True)
+        with tempfile.TemporaryFile() as errors:
+            proc = subprocess.Popen([self.git, '-C', repo, 'fast-import', '--quiet'], stdin=subprocess.PIPE, stderr=errors)
+            try: count = self.write(proc.stdin)
+            except BrokenPipeError: count = None
+            finally:
+                try: proc.stdin.close()
+                except BrokenPipeError: pass
+            if proc.wait() or count is None:
+                errors.seek(0)
+                raise ValueError(errors.read().decode('utf-8', 'replace').strip() or "git fast-import lỗi")
+        if fresh and self.engine.current_branch_name in self.engine.branches:
+            # Repo mới tạo: trỏ HEAD vào nhánh hiện tại và dựng luôn thư mục làm việc
+            branch = f"refs/heads/{self._ref_name(self.engine.current_branch_name)}"
+            subprocess.run([self.git, '-C', repo, 'symbolic-ref', 'HEAD', branch], check=True, capture_output=True)
+            subprocess.run([self.git, '-C', repo, 'checkout', '-q', '-f'], check=True, capture_output=True)
+        return count